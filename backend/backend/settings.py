@@ -37,6 +37,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PrometheusMetricsMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,9 +80,47 @@ DATABASES = {
         'PASSWORD': 'mysecretpassword',  
         'HOST': 'localhost',            
         'PORT': '5432',                  
+        # Keep connections open across requests; the health check re-opens
+        # one that the server or a failover closed in the meantime.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional psycopg connection pool (one per worker process), replacing
+# persistent connections: each request borrows a connection and returns it.
+# Size DB_POOL_MAX_SIZE to the worker's thread count; workers x max size must
+# stay below the server's max_connections.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 4)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+        },
+    }
+
+# Optional streaming replica for read-heavy endpoints (views with
+# `use_read_replica = True`). Leave DB_REPLICA_HOST unset to read everything
+# from the primary. Needs CACHE_BACKEND 'file' or 'redis' (see Caches) so a
+# client's primary pin reaches every worker.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Seconds a client stays pinned to the primary after a write; keep above the
+# replica's worst observed replication lag.
+REPLICA_LAG_SECONDS = int(os.getenv('REPLICA_LAG_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,7 +185,13 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', 
-    ]
+    ],
+    # AI recommender budgets (core.throttling); over them, requests get
+    # keyword-only recommendations instead of a 429.
+    'DEFAULT_THROTTLE_RATES': {
+        'recommend_anon': os.getenv('RECOMMEND_ANON_RATE', '10/min'),
+        'recommend_user': os.getenv('RECOMMEND_USER_RATE', '30/min'),
+    },
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -174,4 +221,162 @@ AUTHENTICATION_BACKENDS = [
 
 # --- Pinecone Credentials ---
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
-PINECONE_ENVIRONMENT = os.getenv('PINECONE_ENVIRONMENT')
\ No newline at end of file
+PINECONE_ENVIRONMENT = os.getenv('PINECONE_ENVIRONMENT')
+
+# 'pinecone' (default) or 'local' for an in-process index built from the database.
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'pinecone')
+
+
+# --- Embedding Backend ---
+# 'huggingface' runs the model on PyTorch; 'onnx' runs the int8 export written
+# by `python manage.py export_onnx_model` with onnxruntime.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'huggingface')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', str(BASE_DIR / 'onnx_models' / 'multi-qa-MiniLM-L6-cos-v1'))
+EMBEDDING_NUM_THREADS = int(os.getenv('EMBEDDING_NUM_THREADS', 2))
+# e.g. http://127.0.0.1:8765 - web workers embed through the shared
+# `run_embedding_server` process instead of loading their own model.
+EMBEDDING_SERVER_URL = os.getenv('EMBEDDING_SERVER_URL')
+
+
+# --- Query Embedding Cache ---
+# Size of the in-memory LRU; set EMBEDDING_CACHE_PATH to a SQLite file to keep
+# embeddings across restarts.
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', 2048))
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH')
+
+# Pre-embed SPECIALIZATION_DESCRIPTIONS phrases in each web worker at startup
+# (not in migrate, cron or other management commands; see core.apps).
+RECOMMENDER_WARMUP_ON_STARTUP = os.getenv('RECOMMENDER_WARMUP_ON_STARTUP', 'False') == 'True'
+
+# Embeddings plus vector searches a worker runs at once; further requests wait
+# up to RECOMMENDER_ADMISSION_TIMEOUT seconds, then get keyword-only results.
+RECOMMENDER_MAX_CONCURRENCY = int(os.getenv('RECOMMENDER_MAX_CONCURRENCY', 2))
+RECOMMENDER_ADMISSION_TIMEOUT = float(os.getenv('RECOMMENDER_ADMISSION_TIMEOUT', 0.1))
+
+# Seconds a cached recommendation is kept; doctor changes invalidate it sooner.
+# LOCAL_CACHE_TIMEOUT applies instead unless CACHE_BACKEND is shared.
+RECOMMENDATION_CACHE_TIMEOUT = int(os.getenv('RECOMMENDATION_CACHE_TIMEOUT', 3600))
+
+# --- Caches ---
+# CACHE_BACKEND picks the store for every named cache: 'locmem' (per process,
+# the default for development and tests), 'file' (shared by the processes of
+# one host, under CACHE_FILE_DIR) or 'redis' (any Redis-compatible server at
+# CACHE_REDIS_URL; needs the `redis` package). Tag invalidation from signals
+# and management commands only reaches other processes with 'file' or 'redis'.
+#   default: recommendations, tag versions, primary pins
+#   api:     cached API responses (core.caching.cache_response)
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_FILE_DIR = os.getenv('CACHE_FILE_DIR', str(BASE_DIR / '.cache'))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+
+def _cache_config(name):
+    location = {
+        'locmem': name,
+        'file': os.path.join(CACHE_FILE_DIR, name),
+        'redis': CACHE_REDIS_URL,
+    }[CACHE_BACKEND]
+    return {'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND], 'LOCATION': location, 'KEY_PREFIX': name}
+
+
+CACHES = {
+    'default': _cache_config('default'),
+    'api': _cache_config('api'),
+}
+
+# Upper bound (seconds) on a cached API response; model signals invalidate
+# entries by tag as soon as the underlying rows change.
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 600))
+# With CACHE_BACKEND 'locmem' each worker has its own cache that other
+# workers' and cron jobs' invalidations never reach, so cached responses and
+# booked slots expire after this many seconds instead.
+LOCAL_CACHE_TIMEOUT = int(os.getenv('LOCAL_CACHE_TIMEOUT', 5))
+
+# Booked slots are patched in the cache by every booking, cancellation and
+# completion; the timeout only evicts days nobody looks at any more. With a
+# per-process ('locmem') cache the patch reaches only the worker that made the
+# change, so entries then live LOCAL_CACHE_TIMEOUT seconds instead. Browsers
+# may reuse a response for BOOKED_SLOTS_MAX_AGE seconds before revalidating.
+BOOKED_SLOTS_CACHE_TIMEOUT = int(os.getenv('BOOKED_SLOTS_CACHE_TIMEOUT', 2 * 24 * 3600))
+BOOKED_SLOTS_MAX_AGE = int(os.getenv('BOOKED_SLOTS_MAX_AGE', 5))
+
+# Concurrent identical cache misses (booked slots, cached responses,
+# recommendations) are computed once per worker (core.single_flight). With
+# SINGLE_FLIGHT_SHARED=True, which needs CACHE_BACKEND 'file' or 'redis',
+# they are computed once across workers; the others wait up to
+# SINGLE_FLIGHT_TIMEOUT seconds for the result.
+SINGLE_FLIGHT_SHARED = os.getenv('SINGLE_FLIGHT_SHARED', 'False') == 'True'
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 10))
+
+# Window (seconds) over which Doctor saves are coalesced before the vector
+# index is synced in the background; 0 syncs inside the saving request.
+VECTOR_SYNC_DEBOUNCE_SECONDS = float(os.getenv('VECTOR_SYNC_DEBOUNCE_SECONDS', 2))
+
+
+# --- Logging ---
+# Records are formatted in the request thread and written to stderr by a
+# background listener (core.log_utils.make_queue_handler). With
+# CORE_LOG_LEVEL=DEBUG, only LOG_DEBUG_SAMPLE_RATE of recommendation traces
+# are kept. LOG_FORMAT=json emits one JSON object per line.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+CORE_LOG_LEVEL = os.getenv('CORE_LOG_LEVEL', LOG_LEVEL)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.01))
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+        'json': {
+            '()': 'core.log_utils.JsonFormatter',
+        },
+    },
+    'filters': {
+        'sample_debug': {
+            '()': 'core.log_utils.DebugSampleFilter',
+            'rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'core.log_utils.make_queue_handler',
+            'formatter': LOG_FORMAT,
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'core': {
+            'level': CORE_LOG_LEVEL,
+        },
+    },
+}
+
+
+# --- Request Metrics ---
+# Fraction of requests that get a Server-Timing header and a
+# `core.request_metrics` log line (DB queries, cache hits, external calls).
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv('REQUEST_METRICS_SAMPLE_RATE', 0.05))
+
+
+# --- Prometheus Metrics ---
+# /metrics is disabled until METRICS_TOKEN is set; Prometheus then sends it as
+# a bearer token (`authorization: {credentials: ...}` in the scrape config).
+# METRICS_ALLOWED_IPS optionally restricts the client address as well, but
+# behind a reverse proxy every request comes from the proxy's address
+# (127.0.0.1 for nginx on the same host), so it cannot replace the token.
+# To aggregate across gunicorn workers and cron jobs, export
+# PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) before starting them.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
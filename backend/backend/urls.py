@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from core.views import custom_login_view
+from core.views import custom_login_view, metrics_view
 
 urlpatterns = [
     # 1. Admin Site
@@ -17,8 +17,11 @@ urlpatterns = [
     
     # 3. Main API Routes
     path('api/', include('core.urls')),
+    
+    # 4. Prometheus Metrics
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-# 4. Media File Serving (For Development)
+# 5. Media File Serving (For Development)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
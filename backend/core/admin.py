@@ -4,8 +4,11 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.contrib import messages
-from .models import User, Doctor, Appointment
+from .models import User, Doctor, Appointment, AppointmentArchive
 from .forms import CustomUserCreationForm, CustomUserChangeForm
+import logging
+
+logger = logging.getLogger(__name__)
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -46,32 +49,19 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ('username', 'first_name', 'last_name', 'email')
     ordering = ('username',)
     
-    def add_view(self, request, form_url='', extra_context=None):
-        """Override add_view to debug form issues"""
-        print("=== ADMIN ADD VIEW ===")
-        return super().add_view(request, form_url, extra_context)
-    
     def save_model(self, request, obj, form, change):
-        print("=== ADMIN SAVE MODEL ===")
-        print(f"Change: {change}")
-        print(f"Object: {obj}")
-        print(f"Form is valid: {form.is_valid()}")
-        
         if not form.is_valid():
-            print("=== FORM ERRORS ===")
+            logger.debug("Admin user form errors for %s: %s", obj, form.errors.as_json())
             for field, errors in form.errors.items():
-                print(f"Field '{field}': {errors}")
                 for error in errors:
                     messages.error(request, f"{field}: {error}")
             
             if form.non_field_errors():
-                print(f"Non-field errors: {form.non_field_errors()}")
                 for error in form.non_field_errors():
                     messages.error(request, f"Error: {error}")
             
             return  
         
-        print("=== SAVING USER ===")
         super().save_model(request, obj, form, change)
         messages.success(request, f"User {obj.username} saved successfully!")
 
@@ -86,6 +76,7 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('id', 'patient', 'doctor', 'date', 'time', 'status')
     list_filter = ('status', 'date', 'doctor')
     search_fields = ('patient__username', 'doctor__user__username')
+    ordering = ('date', 'time')
     fields = ('patient', 'doctor', 'date', 'time', 'status', 'qr_code_preview')
     readonly_fields = ('qr_code_preview',)
 
@@ -93,4 +84,19 @@ class AppointmentAdmin(admin.ModelAdmin):
         if obj.qr_code:
             return format_html(f'<a href="{obj.qr_code.url}" target="_blank"><img src="{obj.qr_code.url}" width="150" height="150" /></a>')
         return "(No QR Code Generated)"
-    qr_code_preview.short_description = 'QR Code Preview'
\ No newline at end of file
+    qr_code_preview.short_description = 'QR Code Preview'
+
+
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'patient', 'doctor', 'date', 'time', 'status', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('patient__username', 'doctor__user__username')
+    ordering = ('-date', '-time')
+    raw_id_fields = ('patient', 'doctor')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
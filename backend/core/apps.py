@@ -1,4 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
+import os
+import sys
+import threading
+
+MANAGEMENT_SCRIPTS = ('manage.py', 'django-admin', 'django-admin.py', '__main__.py')
+
+
+def is_server_process(argv=None, environ=None) -> bool:
+    """
+    Whether this process serves requests: a WSGI server (gunicorn, uwsgi) or
+    the `runserver` child that the autoreloader restarts. Other management
+    commands (migrate, cron jobs, tests) and the autoreloader parent are not.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    if not argv or os.path.basename(argv[0]) not in MANAGEMENT_SCRIPTS:
+        return True
+    if len(argv) < 2 or argv[1] != 'runserver':
+        return False
+    return environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
 
 
 class CoreConfig(AppConfig):
@@ -6,3 +27,7 @@ class CoreConfig(AppConfig):
     name = 'core'
     def ready(self):
         import core.signals
+
+        if settings.RECOMMENDER_WARMUP_ON_STARTUP and is_server_process():
+            from .pinecone_utils import warm_up_recommender
+            threading.Thread(target=warm_up_recommender, daemon=True).start()
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive
+
+ARCHIVED_FIELDS = (
+    'id', 'patient_id', 'doctor_id', 'date', 'time', 'status', 'qr_code',
+    'morning_reminder_sent', 'thirty_min_reminder_sent', 'created_at', 'updated_at', 'doctor_notes',
+)
+
+
+def archivable_appointments(cutoff):
+    return Appointment.objects.filter(status__in=AppointmentArchive.ARCHIVABLE_STATUSES, date__lt=cutoff)
+
+
+def archive_appointments(older_than_days: int = 365, batch_size: int = 5000, dry_run: bool = False):
+    """
+    Moves completed, cancelled and no-show appointments dated more than
+    `older_than_days` ago into AppointmentArchive. Rows are walked by id
+    (keyset pagination) and each batch is copied and deleted in its own
+    transaction, so the job can be interrupted and resumed safely.
+    Returns the number of appointments archived (or that would be).
+    """
+    cutoff = timezone.localdate() - timedelta(days=older_than_days)
+    if dry_run:
+        return archivable_appointments(cutoff).count()
+
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(
+            archivable_appointments(cutoff).filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return archived
+
+        with transaction.atomic():
+            # Re-checked under a row lock in case a row changed since it was listed.
+            rows = list(
+                archivable_appointments(cutoff).filter(id__in=ids)
+                .select_for_update().values(*ARCHIVED_FIELDS)
+            )
+            AppointmentArchive.objects.bulk_create(
+                [AppointmentArchive(**row) for row in rows], ignore_conflicts=True
+            )
+            Appointment.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        archived += len(rows)
+        last_id = ids[-1]
@@ -0,0 +1,182 @@
+import functools
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import (
+    doctor_day_tag, entry_timeout, invalidate_tags, invalidate_tags_on_commit, tag_key, tag_versions,
+)
+from .instrumentation import record_cache_lookup
+from .models import Appointment
+from .single_flight import single_flight
+
+# Must match the slot grid the booking page builds in Appointment.jsx.
+SLOT_MINUTES = 30
+
+
+def doctor_slot_times(doctor):
+    """Bookable start times for a doctor: every SLOT_MINUTES from available_from up to available_to."""
+    current = datetime.combine(date.min, doctor.available_from)
+    end = datetime.combine(date.min, doctor.available_to)
+    while current < end:
+        yield current.time()
+        current += timedelta(minutes=SLOT_MINUTES)
+
+
+def next_free_slots(doctors, days: int = 7, now=None):
+    """
+    Earliest unbooked slot for each doctor within the next `days` days
+    (today included, past slots skipped). Booked slots for all doctors are
+    loaded with a single query. Returns {doctor_id: datetime or None}.
+    """
+    now = now or timezone.localtime()
+    today = now.date()
+    doctors = list(doctors)
+
+    booked = defaultdict(set)
+    appointments = Appointment.objects.active().filter(
+        doctor_id__in=[doctor.id for doctor in doctors],
+        date__gte=today,
+        date__lt=today + timedelta(days=days)
+    ).values_list('doctor_id', 'date', 'time')
+    for doctor_id, day, slot in appointments:
+        booked[(doctor_id, day)].add(slot)
+
+    next_slots = {}
+    for doctor in doctors:
+        next_slots[doctor.id] = None
+        slots = list(doctor_slot_times(doctor))
+        for offset in range(days):
+            day = today + timedelta(days=offset)
+            taken = booked[(doctor.id, day)]
+            free = [slot for slot in slots
+                    if slot not in taken and not (day == today and slot <= now.time())]
+            if free:
+                next_slots[doctor.id] = datetime.combine(day, free[0])
+                break
+    return next_slots
+
+
+def annotate_next_free_slots(doctors, days: int = 7):
+    """Sets `next_available_slot` on every doctor that does not have it yet."""
+    missing = [doctor for doctor in doctors if not hasattr(doctor, 'next_available_slot')]
+    if missing:
+        next_slots = next_free_slots(missing, days)
+        for doctor in missing:
+            doctor.next_available_slot = next_slots[doctor.id]
+    return doctors
+
+
+def sort_by_availability(doctors):
+    """Doctors with the earliest free slot first; fully booked doctors last, in their original order."""
+    return sorted(doctors, key=lambda doctor: (
+        doctor.next_available_slot is None,
+        doctor.next_available_slot or datetime.max
+    ))
+
+
+# --- Booked-slot cache ---
+# Each doctor-day's booked slots are cached as a sorted list of minutes since
+# midnight, stamped with the version of the `doctor-day:{id}:{date}` tag.
+# Appointment saves and deletes patch the cached list in place on commit and
+# bump the tag, so the next lookup is still served from the cache. Only the
+# process making the change sees the patch unless CACHE_BACKEND is shared
+# ('file' or 'redis'); with 'locmem', entries expire after LOCAL_CACHE_TIMEOUT.
+
+
+def slot_minutes(slot) -> int:
+    return slot.hour * 60 + slot.minute
+
+
+def format_slot(minutes: int) -> str:
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def _booked_slots_key(doctor_id, day):
+    return f'booked-slots:{doctor_id}:{day}'
+
+
+def cached_booked_slots(doctor_id: int, day: date):
+    """
+    Booked slots of a doctor-day as sorted minutes since midnight, and the
+    doctor-day version they are valid for (usable as an ETag). A cache hit
+    costs one cache round trip and no query; concurrent misses share one.
+    """
+    store = caches['default']
+    tag = doctor_day_tag(doctor_id, day)
+    key = _booked_slots_key(doctor_id, day)
+
+    found = store.get_many([tag_key(tag), key])
+    version = found.get(tag_key(tag))
+    if version is None:
+        version = tag_versions([tag])[tag]
+    entry = found.get(key)
+    hit = entry is not None and entry['version'] == version
+    record_cache_lookup('booked_slots_cache', hit)
+    if hit:
+        return entry['slots'], version
+
+    def load():
+        slots = [
+            slot_minutes(slot) for slot in
+            Appointment.objects.for_doctor_day(doctor_id, day).active().chronological().values_list('time', flat=True)
+        ]
+        store.set(
+            key, {'version': version, 'slots': slots},
+            timeout=entry_timeout(settings.BOOKED_SLOTS_CACHE_TIMEOUT, 'default')
+        )
+        return slots
+
+    return single_flight('booked_slots', f'{key}:{version}', load), version
+
+
+def _apply_slot_change(doctor_id, day, operations):
+    store = caches['default']
+    tag = doctor_day_tag(doctor_id, day)
+    version = invalidate_tags(tag)[tag]
+    key = _booked_slots_key(doctor_id, day)
+    entry = store.get(key)
+    # Only an entry for the version just replaced is patched; an older one
+    # missed a concurrent change and is left to be reloaded.
+    if entry is None or entry['version'] != version - 1:
+        return
+    slots = set(entry['slots'])
+    for minutes, booked in operations:
+        if booked:
+            slots.add(minutes)
+        else:
+            slots.discard(minutes)
+    store.set(
+        key, {'version': version, 'slots': sorted(slots)},
+        timeout=entry_timeout(settings.BOOKED_SLOTS_CACHE_TIMEOUT, 'default')
+    )
+
+
+def record_slot_change(old, new):
+    """
+    Updates the booked-slot cache when the current transaction commits.
+    `old` and `new` are the appointment's (doctor_id, date, time, status)
+    before and after the change, or None when it was created or deleted.
+    Days are bumped even if no slot was freed or taken, since the doctor's
+    dashboard is tagged with the day too. Past days cannot be booked, so
+    they are only invalidated (coalesced, for bulk deletes such as archival).
+    """
+    changes = {}
+    for state, booked in ((old, False), (new, True)):
+        if state is None:
+            continue
+        doctor_id, day, slot, status = state
+        operations = changes.setdefault((doctor_id, day), [])
+        if status in Appointment.ACTIVE_STATUSES:
+            operations.append((slot_minutes(slot), booked))
+
+    today = timezone.localdate()
+    for (doctor_id, day), operations in changes.items():
+        if day < today:
+            invalidate_tags_on_commit(doctor_day_tag(doctor_id, day))
+        else:
+            transaction.on_commit(functools.partial(_apply_slot_change, doctor_id, day, operations))
@@ -2,6 +2,7 @@
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
 
 class EmailOrUsernameBackend(ModelBackend):
     """
@@ -16,16 +17,17 @@ class EmailOrUsernameBackend(ModelBackend):
         if username is None:
             username = kwargs.get(UserModel.USERNAME_FIELD)
 
-        try:
-            
-            user = UserModel.objects.get(email__iexact=username)
-        except UserModel.DoesNotExist:
-            
-            try:
-                user = UserModel.objects.get(username__iexact=username)
-            except UserModel.DoesNotExist:
-                
-                return None
+        # One query for both identifiers; an email match wins over a username match.
+        candidates = list(
+            UserModel.objects.filter(Q(email__iexact=username) | Q(username__iexact=username))
+            .select_related('doctor')[:2]
+        )
+        if not candidates:
+            return None
+        user = next(
+            (candidate for candidate in candidates if candidate.email.lower() == username.lower()),
+            candidates[0]
+        )
         
         
         if user.check_password(password):
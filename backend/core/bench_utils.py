@@ -0,0 +1,17 @@
+"""Helpers shared by the offline benchmarks (recommender, database connections)."""
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples_seconds):
+    """p50, p95 and mean of latency samples given in seconds, in milliseconds."""
+    milliseconds = [sample * 1000 for sample in samples_seconds]
+    return {
+        'p50_ms': round(percentile(milliseconds, 0.50), 3),
+        'p95_ms': round(percentile(milliseconds, 0.95), 3),
+        'mean_ms': round(sum(milliseconds) / len(milliseconds), 3),
+    }
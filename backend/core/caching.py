@@ -0,0 +1,180 @@
+"""
+Tag-invalidated caching for API responses and other derived data.
+
+Every entry is stored with the versions of the tags it depends on
+(`doctor:{id}`, `doctor-set`, `doctor-day:{id}:{date}`, `patient:{id}`).
+Invalidating a tag bumps its version, which makes every entry recorded
+under the old version a miss, without tracking which keys carry the tag.
+Tag versions live in the `default` cache; entries in a named cache (`api`
+for responses).
+
+The User, Doctor and Appointment signals invalidate tags after the saving
+transaction commits, coalescing the tags of a bulk delete into one bump each.
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .db_router import primary_reads
+from .instrumentation import record_cache_lookup
+from .metrics import RESPONSE_CACHE_LOOKUPS
+from .single_flight import single_flight
+
+API_CACHE = 'api'
+DOCTOR_SET_TAG = 'doctor-set'
+
+_pending = threading.local()
+
+
+def shared_cache(alias: str = 'default') -> bool:
+    """Whether every process sees the same `alias` cache (CACHE_BACKEND 'file' or 'redis')."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def entry_timeout(timeout, alias: str):
+    """
+    `timeout` for an entry in `alias`, capped at LOCAL_CACHE_TIMEOUT seconds
+    unless both that cache and the tag versions are shared: invalidations from
+    other workers and cron jobs never reach a per-process cache.
+    """
+    if shared_cache(alias) and shared_cache('default'):
+        return timeout
+    return settings.LOCAL_CACHE_TIMEOUT if timeout is None else min(timeout, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def doctor_tag(doctor_id) -> str:
+    return f'doctor:{doctor_id}'
+
+
+def doctor_day_tag(doctor_id, day) -> str:
+    return f'doctor-day:{doctor_id}:{day}'
+
+
+def patient_tag(user_id) -> str:
+    return f'patient:{user_id}'
+
+
+def appointment_tags(doctor_id, patient_id):
+    """
+    Tags of the doctor's and patient's views of one appointment. Its
+    `doctor-day` tag is bumped by the booked-slot cache
+    (`core.availability.record_slot_change`), which also patches the slots.
+    """
+    return [doctor_tag(doctor_id), patient_tag(patient_id)]
+
+
+def tag_key(tag):
+    return f'tag-version:{tag}'
+
+
+def tag_versions(tags) -> dict:
+    """Current version of each tag; a tag never seen (or evicted) starts at a fresh, unique version."""
+    tag_cache = caches['default']
+    keys = {tag: tag_key(tag) for tag in tags}
+    found = tag_cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        for key in missing:
+            tag_cache.add(key, time.time_ns(), timeout=None)
+        found.update(tag_cache.get_many(missing))
+    return {tag: found.get(key) for tag, key in keys.items()}
+
+
+def invalidate_tags(*tags):
+    """
+    Bumps the version of each tag now and returns {tag: new version}. Prefer
+    `invalidate_tags_on_commit` inside a transaction.
+    """
+    tag_cache = caches['default']
+    versions = {}
+    for tag in set(tags):
+        try:
+            versions[tag] = tag_cache.incr(tag_key(tag))
+        except ValueError:
+            versions[tag] = time.time_ns()
+            tag_cache.set(tag_key(tag), versions[tag], timeout=None)
+    return versions
+
+
+def _flush_pending_tags():
+    tags = getattr(_pending, 'tags', None)
+    if tags:
+        _pending.tags = set()
+        invalidate_tags(*tags)
+
+
+def invalidate_tags_on_commit(*tags):
+    """
+    Invalidates `tags` once the current transaction commits, so a concurrent
+    reader cannot re-cache the pre-commit rows. Tags queued by many saves in
+    one transaction are bumped once.
+    """
+    if not hasattr(_pending, 'tags'):
+        _pending.tags = set()
+    _pending.tags.update(tags)
+    transaction.on_commit(_flush_pending_tags)
+
+
+def cache_response(tags, per_user=False, timeout=None, alias=API_CACHE):
+    """
+    Caches the data of a DRF view method's 200 responses, keyed by view and
+    full path (and the user with `per_user=True`), until one of its tags is
+    invalidated or API_CACHE_TIMEOUT passes (LOCAL_CACHE_TIMEOUT with a
+    per-process cache). Misses read from the primary database, and
+    concurrent misses for the same entry run the view once
+    (`core.single_flight`).
+
+    `tags` is a list or a callable `(view, request, *args, **kwargs) -> list`;
+    returning None skips the cache for that request.
+
+        @cache_response(tags=lambda view, request, pk=None, **kwargs: [doctor_tag(pk)])
+        def retrieve(self, request, *args, **kwargs):
+            return super().retrieve(request, *args, **kwargs)
+    """
+    def decorator(method):
+        view_name = f'{method.__module__}.{method.__qualname__}'
+
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            entry_tags = tags(view, request, *args, **kwargs) if callable(tags) else tags
+            if entry_tags is None:
+                return method(view, request, *args, **kwargs)
+
+            user_part = request.user.pk if per_user else '-'
+            digest = hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest()
+            key = f'response:{view_name}:{user_part}:{digest}'
+
+            store = caches[alias]
+            versions = tag_versions(entry_tags)
+            entry = store.get(key)
+            hit = entry is not None and entry['tags'] == versions
+            record_cache_lookup('response_cache', hit)
+            RESPONSE_CACHE_LOOKUPS.labels(method.__qualname__, 'hit' if hit else 'miss').inc()
+            if hit:
+                return Response(entry['value'])
+
+            def render():
+                # Filled from the primary: a lagging replica read right after
+                # an invalidation would be cached under the new tag versions.
+                with primary_reads():
+                    response = method(view, request, *args, **kwargs)
+                if response.status_code == 200:
+                    store.set(
+                        key, {'tags': versions, 'value': response.data},
+                        timeout=entry_timeout(settings.API_CACHE_TIMEOUT if timeout is None else timeout, alias)
+                    )
+                return response.status_code, response.data
+
+            flight_key = f"{key}:{','.join(str(version) for version in versions.values())}"
+            status_code, data = single_flight('response', flight_key, render)
+            return Response(data, status=status_code)
+        return wrapper
+    return decorator
@@ -0,0 +1,90 @@
+"""
+Connection setup benchmark: the cost of a minimal request's database work
+with a new connection per request (CONN_MAX_AGE=0), with persistent
+connections, and with the psycopg connection pool.
+
+Each mode uses its own connection wrapper built from the alias's settings, and
+simulates a request the way Django's request_started/request_finished
+handlers do, so the live `default` connection is left alone.
+"""
+import copy
+import importlib.util
+import time
+
+from django.db import connections
+from django.db.utils import load_backend
+
+from .bench_utils import summarize
+
+MODES = ('per_request', 'persistent', 'pool')
+
+
+def pool_available(alias: str = 'default') -> bool:
+    return (
+        connections[alias].vendor == 'postgresql'
+        and importlib.util.find_spec('psycopg_pool') is not None
+    )
+
+
+def _mode_settings(settings_dict, mode):
+    settings_dict = copy.deepcopy(settings_dict)
+    options = settings_dict.setdefault('OPTIONS', {})
+    pool_options = options.pop('pool', None)
+    if mode == 'per_request':
+        settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+    elif mode == 'persistent':
+        settings_dict.update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+    else:
+        settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        options['pool'] = pool_options if isinstance(pool_options, dict) else True
+    return settings_dict
+
+
+def _simulated_request(wrapper):
+    wrapper.close_if_unusable_or_obsolete()
+    with wrapper.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    wrapper.close_if_unusable_or_obsolete()
+
+
+def run_connection_benchmark(alias: str = 'default', requests: int = 200, modes=MODES):
+    """
+    Runs `requests` simulated requests in each mode (the pool mode only with
+    PostgreSQL and psycopg_pool installed) and returns a JSON-serializable
+    dict of per-request latency, plus the p50 saved against a new connection
+    per request.
+    """
+    base_settings = connections[alias].settings_dict
+    backend = load_backend(base_settings['ENGINE'])
+    results = {}
+
+    for mode in modes:
+        if mode == 'pool' and not pool_available(alias):
+            continue
+        wrapper = backend.DatabaseWrapper(_mode_settings(base_settings, mode), f'{alias}_benchmark_{mode}')
+        try:
+            _simulated_request(wrapper)  # Opens the pool / first connection outside the samples.
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                _simulated_request(wrapper)
+                samples.append(time.perf_counter() - started)
+        finally:
+            wrapper.close()
+            if mode == 'pool':
+                wrapper.close_pool()
+        results[mode] = summarize(samples)
+
+    baseline = results.get('per_request')
+    if baseline:
+        for mode, summary in results.items():
+            if mode != 'per_request':
+                summary['p50_saved_ms'] = round(baseline['p50_ms'] - summary['p50_ms'], 3)
+
+    return {
+        'alias': alias,
+        'vendor': connections[alias].vendor,
+        'requests': requests,
+        'latency': results,
+    }
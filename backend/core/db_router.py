@@ -0,0 +1,97 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Routing state of the request being handled: whether its reads may go to the
+# replica, and whether it has written (which pins it to the primary).
+_routing_state = ContextVar('core_db_routing_state', default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def routing_request():
+    """Scopes routing state to one request; reads go to the primary until `allow_replica_reads` is called."""
+    state = {'replica': False, 'wrote': False}
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+def allow_replica_reads():
+    state = _routing_state.get()
+    if state is not None:
+        state['replica'] = True
+
+
+@contextmanager
+def primary_reads():
+    """
+    Sends the block's reads to the primary even in a replica-safe request, for
+    results that outlive the request (shared cache entries) and must not
+    capture replica lag.
+    """
+    state = _routing_state.get()
+    if state is None or not state['replica']:
+        yield
+        return
+    state['replica'] = False
+    try:
+        yield
+    finally:
+        state['replica'] = True
+
+
+def view_uses_replica(view_func) -> bool:
+    """Views opt in with `use_read_replica = True` (on the class for class-based views)."""
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return bool(getattr(view_class or view_func, 'use_read_replica', False))
+
+
+def primary_pin_key(request):
+    """
+    Identifies the client (token or session) whose recent writes must be read
+    back from the primary, or None for a client with neither: behind a proxy
+    every anonymous request shares the proxy's address, so one pin would
+    send all anonymous reads to the primary.
+    """
+    identity = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not identity:
+        return None
+    return f"db-primary-pin:{hashlib.sha1(identity.encode('utf-8')).hexdigest()}"
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the `replica` database only inside requests that
+    `core.middleware.ReplicaRoutingMiddleware` marked as replica-safe, and only until the
+    request writes. Everything else, including all writes, uses `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and state['replica'] and not state['wrote']:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,223 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from .instrumentation import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Normalizes a query so trivially different spellings share a cache entry.
+    The MiniLM model is uncased, so lowercasing does not change the embedding.
+    """
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with an optional SQLite tier.
+
+    The in-memory tier holds the `max_size` most recently used vectors. When a
+    `path` is given, vectors are also written to a SQLite file so the cache
+    survives restarts; disk hits are promoted back into memory. Every worker
+    may open the same file: it runs in WAL mode with a busy timeout, new
+    vectors are written in batches of `flush_every` (or after
+    `flush_interval` seconds), and a locked or failing database only costs a
+    miss, never an error.
+    """
+
+    def __init__(self, max_size: int = 2048, path: str = None, namespace: str = '',
+                 flush_every: int = 32, flush_interval: float = 5.0, busy_timeout: float = 1.0):
+        self.max_size = max_size
+        self.path = path
+        self.namespace = namespace
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Embedding cache: SQLite tier at %s disabled: %s", path, e)
+                self._db = None
+
+    def _key(self, text: str) -> str:
+        return f"{self.namespace}|{normalize_query_text(text)}"
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, text: str):
+        """Returns the cached vector for `text`, or None on a miss."""
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                vector = self._pending.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.OperationalError as e:
+                    self.disk_errors += 1
+                    logger.warning("Embedding cache: SQLite read failed: %s", e)
+                    row = None
+                if row is not None:
+                    vector = array('f', row[0]).tolist()
+                    self._remember(key, vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def set(self, text: str, vector):
+        key = self._key(text)
+        vector = list(vector)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._pending[key] = vector
+                if (len(self._pending) >= self.flush_every
+                        or time.monotonic() - self._last_flush >= self.flush_interval):
+                    self._flush_locked()
+
+    def flush(self):
+        """Writes the vectors not yet persisted to the SQLite tier."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if self._db is None or not self._pending:
+            return
+        rows = [(key, array('f', vector).tobytes()) for key, vector in self._pending.items()]
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._db.commit()
+        except sqlite3.OperationalError as e:
+            self._db.rollback()
+            self.disk_errors += 1
+            logger.warning("Embedding cache: could not persist %d vectors, will retry: %s", len(rows), e)
+            # Keep the newest vectors for the next attempt, bounded like the LRU.
+            while len(self._pending) > self.max_size:
+                self._pending.pop(next(iter(self._pending)))
+            return
+        self._pending.clear()
+
+    def clear(self, include_disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = self.disk_errors = 0
+            if include_disk and self._db is not None:
+                self._pending.clear()
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'disk_errors': self.disk_errors,
+                'pending_writes': len(self._pending),
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'persistent': self._db is not None,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` wrapper that answers `embed_query` from an
+    `EmbeddingCache` and only calls the underlying provider on a miss.
+
+    The provider is built lazily by `provider_factory` on first use, so
+    importing this module does not load the model.
+    """
+
+    def __init__(self, provider_factory, cache: EmbeddingCache):
+        self.provider_factory = provider_factory
+        self.cache = cache
+        self._provider = None
+        self._provider_lock = threading.Lock()
+
+    @property
+    def provider(self) -> Embeddings:
+        if self._provider is None:
+            with self._provider_lock:
+                if self._provider is None:
+                    self._provider = self.provider_factory()
+        return self._provider
+
+    def embed_query(self, text: str):
+        vector = self.cache.get(text)
+        record_cache_lookup('embedding_cache', vector is not None)
+        if vector is None:
+            vector = self.provider.embed_query(text)
+            self.cache.set(text, vector)
+        return vector
+
+    def embed_queries(self, texts):
+        """
+        Batched `embed_query`: cached texts are answered from the cache and all
+        misses are embedded in a single forward pass.
+        """
+        vectors = [self.cache.get(text) for text in texts]
+        for vector in vectors:
+            record_cache_lookup('embedding_cache', vector is not None)
+        missing_texts = list(dict.fromkeys(
+            text for text, vector in zip(texts, vectors) if vector is None
+        ))
+
+        if missing_texts:
+            computed = dict(zip(missing_texts, self.provider.embed_documents(missing_texts)))
+            for text, vector in computed.items():
+                self.cache.set(text, vector)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        return vectors
+
+    def embed_documents(self, texts):
+        # Document passages are embedded at indexing time only; caching them
+        # would just evict the query entries we care about.
+        return self.provider.embed_documents(texts)
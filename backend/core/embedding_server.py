@@ -0,0 +1,167 @@
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects embedding requests from many concurrent callers and runs them
+    through the model together. A batch is flushed when it reaches
+    `max_batch_size` texts or `max_wait_ms` after its first request arrived.
+    """
+
+    def __init__(self, provider: Embeddings, max_batch_size: int = 64, max_wait_ms: int = 5):
+        self.provider = provider
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def embed(self, texts):
+        """Blocks until `texts` have been embedded as part of some batch."""
+        job = {'texts': texts, 'done': threading.Event(), 'vectors': None, 'error': None}
+        self._pending.put(job)
+        job['done'].wait()
+        if job['error'] is not None:
+            raise job['error']
+        return job['vectors']
+
+    def _collect(self):
+        jobs = [self._pending.get()]
+        size = len(jobs[0]['texts'])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            size += len(job['texts'])
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            texts = [text for job in jobs for text in job['texts']]
+            try:
+                vectors = self.provider.embed_documents(texts)
+                offset = 0
+                for job in jobs:
+                    job['vectors'] = vectors[offset:offset + len(job['texts'])]
+                    offset += len(job['texts'])
+            except Exception as e:
+                for job in jobs:
+                    job['error'] = e
+            for job in jobs:
+                job['done'].set()
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    """POST /embed with {"texts": [...]} returns {"vectors": [...]}; GET /health for liveness."""
+
+    batcher: MicroBatcher = None
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'Not found.'})
+
+    def do_POST(self):
+        if self.path != '/embed':
+            self._send_json(404, {'error': 'Not found.'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            texts = json.loads(self.rfile.read(length)).get('texts')
+        except (ValueError, AttributeError):
+            texts = None
+
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            self._send_json(400, {'error': "'texts' must be a list of strings."})
+            return
+
+        try:
+            vectors = self.batcher.embed(texts) if texts else []
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self._send_json(200, {'vectors': vectors})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_embedding_server(host: str, port: int, batcher: MicroBatcher) -> ThreadingHTTPServer:
+    handler = type('BoundEmbeddingRequestHandler', (EmbeddingRequestHandler,), {'batcher': batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Client for the shared embedding server started with
+    `python manage.py run_embedding_server`.
+
+    If the server cannot be reached, embeddings are computed in-process with
+    the provider built by `fallback_factory`, and the server is not retried
+    for `retry_after` seconds so callers do not pay a timeout on every request.
+    """
+
+    def __init__(self, url: str, fallback_factory, timeout: float = 2.0, retry_after: float = 30.0):
+        self.url = url.rstrip('/')
+        self.fallback_factory = fallback_factory
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._session = requests.Session()
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+        self._server_down_until = 0.0
+
+    @property
+    def fallback(self) -> Embeddings:
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    self._fallback = self.fallback_factory()
+        return self._fallback
+
+    def embed_documents(self, texts):
+        if time.monotonic() >= self._server_down_until:
+            try:
+                response = self._session.post(
+                    f"{self.url}/embed", json={'texts': list(texts)}, timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json()['vectors']
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logger.warning("Embedding server unavailable (%s). Falling back to the in-process model.", e)
+                self._server_down_until = time.monotonic() + self.retry_after
+
+        return self.fallback.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
@@ -24,15 +24,10 @@ class CustomUserCreationForm(UserCreationForm):
         super().__init__(*args, **kwargs)
         
         self.fields['email'].required = True
-        
-        
-        print("=== FORM FIELDS ===")
-        for field_name in self.fields:
-            print(f"Field: {field_name}")
+
     
     def clean_username(self):
         username = self.cleaned_data.get('username')
-        print(f"=== CLEANING USERNAME: '{username}' ===")
         
         if not username:
             raise forms.ValidationError("Username is required.")
@@ -48,7 +43,6 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        print(f"=== CLEANING EMAIL: '{email}' ===")
         
         if not email:
             raise forms.ValidationError("Email is required.")
@@ -61,27 +55,18 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean(self):
         cleaned_data = super().clean()
-        print("=== FORM CLEAN METHOD ===")
-        print(f"Cleaned data: {cleaned_data}")
         
         
         password1 = cleaned_data.get('password1')
         password2 = cleaned_data.get('password2')
         
-        print(f"Password1: {password1}")
-        print(f"Password2: {password2}")
-        
         if password1 and password2 and password1 != password2:
             raise forms.ValidationError("Passwords don't match.")
         
         return cleaned_data
     
     def save(self, commit=True):
-        print("=== FORM SAVE METHOD ===")
         user = super().save(commit=False)
-        print(f"User object: {user}")
-        print(f"User username: {user.username}")
-        print(f"User email: {user.email}")
         
         if commit:
             user.save()
@@ -0,0 +1,58 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Metrics of the request being handled, set by RequestMetricsMiddleware for
+# sampled requests only. Outside a sampled request every hook is a no-op.
+_current_metrics = ContextVar('core_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Time spent per named phase (db, embedding, infobip...) and cache hit/miss counts for one request."""
+
+    def __init__(self):
+        self.timings = {}
+        self.cache = {}
+
+    def add_timing(self, name: str, seconds: float):
+        total, count = self.timings.get(name, (0.0, 0))
+        self.timings[name] = (total + seconds, count + 1)
+
+    def add_cache_lookup(self, name: str, hit: bool):
+        hits, misses = self.cache.get(name, (0, 0))
+        self.cache[name] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect_metrics():
+    """Collects the metrics recorded inside the block; yields the RequestMetrics."""
+    metrics = RequestMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """Adds the time spent in the block to phase `name` of the current request."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, time.perf_counter() - started)
+
+
+def record_cache_lookup(name: str, hit: bool):
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_cache_lookup(name, hit)
@@ -0,0 +1,77 @@
+import atexit
+import json
+import logging
+import queue
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# Random draw shared by every debug record of the current trace, so a sampled
+# recommendation logs its whole trace rather than a random subset of lines.
+_trace_draw = ContextVar('core_trace_draw', default=None)
+
+
+@contextmanager
+def sampled_trace():
+    """
+    Groups the debug records logged inside the block into one trace that
+    `DebugSampleFilter` keeps or drops as a whole. Usable as a decorator.
+    """
+    token = _trace_draw.set(random.random())
+    try:
+        yield
+    finally:
+        _trace_draw.reset(token)
+
+
+class DebugSampleFilter(logging.Filter):
+    """
+    Passes every record at INFO and above, and only a `rate` fraction of
+    DEBUG records (whole traces when inside `sampled_trace`).
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        draw = _trace_draw.get()
+        if draw is None:
+            draw = random.random()
+        return draw < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log search tools."""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'metrics', {}))
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def make_queue_handler(stream=None) -> QueueHandler:
+    """
+    Handler factory for LOGGING (`'()': 'core.log_utils.make_queue_handler'`).
+
+    Returns a QueueHandler that formats records in the calling thread and
+    hands them to a background listener thread writing to `stream` (stderr by
+    default), so request threads never block on log I/O. A factory rather
+    than a `class` entry because dictConfig treats QueueHandler classes
+    specially and, from Python 3.12, expects them to reference other handlers.
+    """
+    handler = QueueHandler(queue.SimpleQueue())
+    handler.listener = QueueListener(handler.queue, logging.StreamHandler(stream))
+    handler.listener.start()
+    atexit.register(handler.listener.stop)
+    return handler
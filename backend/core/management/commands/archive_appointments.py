@@ -0,0 +1,41 @@
+# core/management/commands/archive_appointments.py
+import time
+from django.core.management.base import BaseCommand
+from core.archival import archive_appointments
+
+
+class Command(BaseCommand):
+    help = 'Moves completed, cancelled and no-show appointments older than N days into the archive table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=365,
+            help='Archive finished appointments dated more than this many days ago (default: 365)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Appointments moved per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many appointments would be archived without moving them'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = archive_appointments(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.perf_counter() - start
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: Would archive {count} appointments."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Archived {count} appointments in {elapsed:.1f}s."))
@@ -0,0 +1,30 @@
+# core/management/commands/benchmark_db_connections.py
+import json
+from django.core.management.base import BaseCommand
+from core.db_benchmark import run_connection_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Compares per-request database connection cost with a new connection per request, '
+            'persistent connections and the psycopg pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated requests per mode (default: 200)')
+        parser.add_argument('--database', default='default', help="Database alias to benchmark (default: 'default')")
+        parser.add_argument('--json', action='store_true', help='Print the full JSON report')
+
+    def handle(self, *args, **options):
+        report = run_connection_benchmark(options['database'], requests=options['requests'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{report['requests']} simulated requests per mode on {report['vendor']} ({report['alias']}):")
+        for mode, summary in report['latency'].items():
+            line = f"  {mode:<12} p50 {summary['p50_ms']:.3f} ms, p95 {summary['p95_ms']:.3f} ms"
+            if 'p50_saved_ms' in summary:
+                line += f", {summary['p50_saved_ms']:.3f} ms saved per request"
+            self.stdout.write(line)
+        if 'pool' not in report['latency']:
+            self.stdout.write("  pool         skipped (needs PostgreSQL and psycopg[pool])")
@@ -0,0 +1,49 @@
+# core/management/commands/benchmark_recommender.py
+import json
+import platform
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.pinecone_utils import build_embedding_provider
+from core.recommender_benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Offline accuracy (top-1/top-3) and per-stage latency benchmark of the AI recommender, using a local vector index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Passes over the labeled queries for latency figures (default: 3)'
+        )
+        parser.add_argument(
+            '--embedding-backend',
+            default=settings.EMBEDDING_BACKEND,
+            help='Embedding backend to benchmark: huggingface or onnx (default: EMBEDDING_BACKEND)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout'
+        )
+
+    def handle(self, *args, **options):
+        provider = build_embedding_provider(options['embedding_backend'])
+        provider.embed_query("query: warm-up")
+
+        report = run_benchmark(provider, repeat=options['repeat'])
+        report['embedding_backend'] = options['embedding_backend']
+        report['python'] = platform.python_version()
+        report['timestamp'] = timezone.now().isoformat()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(
+                f"top-1 {report['accuracy']['top1']:.2%}, top-3 {report['accuracy']['top3']:.2%}, "
+                f"{report['throughput_qps']} queries/s. Report written to {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,80 @@
+# core/management/commands/export_onnx_model.py
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.onnx_embeddings import ONNX_MODEL_FILENAME
+from core.pinecone_utils import EMBEDDING_MODEL_NAME
+
+
+class Command(BaseCommand):
+    help = 'Exports the sentence-transformers embedding model to ONNX and quantizes it to int8 for EMBEDDING_BACKEND=onnx.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            default=f"sentence-transformers/{EMBEDDING_MODEL_NAME}",
+            help='Hugging Face model id or local path to export'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=settings.ONNX_MODEL_DIR,
+            help='Directory to write the ONNX model and tokenizer to (default: ONNX_MODEL_DIR)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import torch
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError as e:
+            raise CommandError(f"Exporting requires torch, transformers, onnx and onnxruntime: {e}")
+
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        float_model_path = os.path.join(output_dir, 'model.onnx')
+        quantized_model_path = os.path.join(output_dir, ONNX_MODEL_FILENAME)
+
+        self.stdout.write(f"Loading {options['model']}...")
+        tokenizer = AutoTokenizer.from_pretrained(options['model'])
+        model = AutoModel.from_pretrained(options['model'])
+        model.eval()
+
+        class LastHiddenState(torch.nn.Module):
+            # Binds inputs by keyword so the export does not depend on the
+            # positional signature of the transformers forward().
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    token_type_ids=token_type_ids
+                ).last_hidden_state
+
+        sample = tokenizer(["query: chest pain"], return_tensors='pt')
+        input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+        self.stdout.write(f"Exporting to {float_model_path}...")
+        with torch.no_grad():
+            torch.onnx.export(
+                LastHiddenState(model),
+                tuple(sample[name] for name in input_names),
+                float_model_path,
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False,
+            )
+
+        self.stdout.write(f"Quantizing to {quantized_model_path}...")
+        quantize_dynamic(float_model_path, quantized_model_path, weight_type=QuantType.QInt8)
+        tokenizer.save_pretrained(output_dir)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"ONNX model written to {output_dir}. Set EMBEDDING_BACKEND=onnx to use it."
+        ))
@@ -0,0 +1,74 @@
+# core/management/commands/reindex_doctors.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core import pinecone_utils
+
+
+class Command(BaseCommand):
+    help = 'Incrementally syncs the doctor vector index: only new, changed or deactivated doctors are embedded, upserted or removed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Documents per upsert/delete request (default: 100)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of batches uploaded in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=3,
+            help='Retries per failed batch, with exponential backoff (default: 3)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore stored content hashes, re-upsert every active doctor and remove '
+                 'every other doctor id listed in the index'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be changed without touching the index'
+        )
+
+    def handle(self, *args, **options):
+        if pinecone_utils.pinecone_vectorstore is None:
+            raise CommandError("Vector store is not available. Check the Pinecone credentials.")
+
+        if not pinecone_utils.tracks_index_state():
+            self.stdout.write(self.style.WARNING(
+                "VECTOR_BACKEND is 'local': the in-memory index is rebuilt in every process, nothing to sync."
+            ))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("DRY RUN MODE - No changes will be made"))
+
+        start = time.perf_counter()
+        report = pinecone_utils.reindex_doctors(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            max_retries=options['retries'],
+            full=options['full'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.perf_counter() - start
+
+        verb = "Would upsert" if options['dry_run'] else "Upserted"
+        self.stdout.write(f"{verb} {report['upserted']} doctors, "
+                          f"{'would delete' if options['dry_run'] else 'deleted'} {report['deleted']}, "
+                          f"{report['unchanged']} unchanged ({elapsed:.2f}s).")
+
+        if report['failed']:
+            self.stdout.write(self.style.ERROR(
+                f"{len(report['failed'])} doctors failed after retries: {report['failed']}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Doctor vector index is up to date."))
@@ -0,0 +1,55 @@
+# core/management/commands/run_embedding_server.py
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.embedding_server import MicroBatcher, build_embedding_server
+from core.pinecone_utils import build_embedding_provider
+
+
+class Command(BaseCommand):
+    help = 'Runs a local embedding server so all web workers on this host share one copy of the embedding model.'
+
+    def add_arguments(self, parser):
+        default_url = urlparse(settings.EMBEDDING_SERVER_URL or 'http://127.0.0.1:8765')
+        parser.add_argument(
+            '--host',
+            default=default_url.hostname,
+            help='Interface to listen on (default: host of EMBEDDING_SERVER_URL, or 127.0.0.1)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=default_url.port or 8765,
+            help='Port to listen on (default: port of EMBEDDING_SERVER_URL, or 8765)'
+        )
+        parser.add_argument(
+            '--max-batch-size',
+            type=int,
+            default=64,
+            help='Maximum number of texts embedded in one forward pass (default: 64)'
+        )
+        parser.add_argument(
+            '--max-wait-ms',
+            type=int,
+            default=5,
+            help='How long to wait for more requests before running a batch (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Loading '{settings.EMBEDDING_BACKEND}' embedding backend...")
+        batcher = MicroBatcher(
+            build_embedding_provider(),
+            max_batch_size=options['max_batch_size'],
+            max_wait_ms=options['max_wait_ms']
+        )
+        server = build_embedding_server(options['host'], options['port'], batcher)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedding server listening on http://{options['host']}:{options['port']}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Shutting down embedding server.")
+        finally:
+            server.server_close()
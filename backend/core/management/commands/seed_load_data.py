@@ -0,0 +1,203 @@
+# core/management/commands/seed_load_data.py
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from core.models import User, Doctor, Appointment
+from core.caching import DOCTOR_SET_TAG, invalidate_tags
+from core.specialization_data import SPECIALIZATION_DESCRIPTIONS
+
+SLOT_MINUTES = 30
+WORKING_HOURS = [(dt_time(9, 0), dt_time(17, 0)), (dt_time(8, 0), dt_time(16, 0)), (dt_time(10, 0), dt_time(18, 0))]
+FIRST_NAMES = ['Aarav', 'Sita', 'Ram', 'Gita', 'Hari', 'Anita', 'Bikash', 'Sunita', 'Nabin', 'Puja', 'Rajesh', 'Kabita']
+LAST_NAMES = ['Sharma', 'Thapa', 'Gurung', 'Shrestha', 'Adhikari', 'Karki', 'Rai', 'Tamang', 'Magar', 'Poudel']
+
+# (status, weight) for appointments before and after today.
+PAST_STATUS_MIX = [('completed', 72), ('no_show', 9), ('cancelled', 15), ('scheduled', 4)]
+FUTURE_STATUS_MIX = [('scheduled', 88), ('cancelled', 12)]
+
+
+def weighted_choice(rng, mix):
+    statuses, weights = zip(*mix)
+    return rng.choices(statuses, weights=weights)[0]
+
+
+@contextmanager
+def receivers_detached(*signals):
+    """
+    Detaches every receiver of `signals` for the duration of the block. With
+    no delete receivers, Django deletes related rows with one DELETE per table
+    instead of loading them and running cache, slot and vector sync handlers
+    (and Pinecone deletes) for each row.
+    """
+    saved = []
+    for signal in signals:
+        with signal.lock:
+            saved.append((signal, signal.receivers))
+            signal.receivers = []
+            signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            with signal.lock:
+                signal.receivers = receivers
+                signal.sender_receivers_cache.clear()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = ('Generates synthetic patients, doctors and years of appointments with bulk_create '
+            '(no signals: no vector sync, QR codes or SMS). Deterministic for a given --seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=10000, help='Patients to create (default: 10000)')
+        parser.add_argument('--doctors', type=int, default=200, help='Doctors to create, spread over all specializations (default: 200)')
+        parser.add_argument('--appointments', type=int, default=1000000, help='Approximate number of appointments (default: 1000000)')
+        parser.add_argument('--years', type=float, default=3, help='Years of appointment history before today (default: 3)')
+        parser.add_argument('--future-days', type=int, default=30, help='Days of upcoming appointments after today (default: 30)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk_create (default: 5000)')
+        parser.add_argument('--prefix', default='load', help="Username prefix of generated users (default: 'load')")
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data with the same prefix first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        chunk_size = options['chunk_size']
+        start = time.perf_counter()
+
+        generated_users = User.objects.filter(username__startswith=f"{prefix}_")
+        if options['clear']:
+            with receivers_detached(pre_delete, post_delete), transaction.atomic():
+                deleted, _ = Appointment.objects.filter(patient__in=generated_users).delete()
+                deleted += generated_users.delete()[0]
+            invalidate_tags(DOCTOR_SET_TAG)
+            self.stdout.write(f"Deleted {deleted} previously generated rows.")
+            self.stdout.write("Vectors of deleted doctors stay in the index until 'python manage.py reindex_doctors' runs.")
+        elif generated_users.exists():
+            raise CommandError(f"Users with prefix '{prefix}_' already exist. Use --clear or a different --prefix.")
+
+        password = make_password('loadtest123')
+        today = date.today()
+
+        patients = self.create_users(rng, prefix, 'patient', options['patients'], password, chunk_size)
+        doctor_users = self.create_users(rng, prefix, 'doctor', options['doctors'], password, chunk_size)
+        doctors = self.create_doctors(rng, doctor_users, chunk_size)
+        self.stdout.write(f"Created {len(patients)} patients and {len(doctors)} doctors.")
+
+        first_day = today - timedelta(days=int(options['years'] * 365))
+        last_day = today + timedelta(days=options['future_days'])
+        appointments = self.generate_appointments(
+            rng, doctors, [patient.id for patient in patients], first_day, last_day, today, options['appointments']
+        )
+
+        created = 0
+        report_every = chunk_size * 20
+        for chunk in chunked(appointments, chunk_size):
+            with transaction.atomic():
+                Appointment.objects.bulk_create(chunk)
+            created += len(chunk)
+            if created // report_every != (created - len(chunk)) // report_every:
+                self.stdout.write(f"  {created} appointments...")
+
+        invalidate_tags(DOCTOR_SET_TAG)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} appointments from {first_day} to {last_day} in {elapsed:.1f}s."
+        ))
+        self.stdout.write("Doctors were not indexed; run 'python manage.py reindex_doctors' to add them to the vector index.")
+
+    def create_users(self, rng, prefix, role, count, password, chunk_size):
+        users = []
+        for i in range(count):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            users.append(User(
+                username=f"{prefix}_{role}_{i}",
+                email=f"{prefix}_{role}_{i}@example.com",
+                password=password,
+                first_name=first_name,
+                last_name=last_name,
+                role=role,
+                gender=rng.choice(['male', 'female', 'other']),
+                phone_number=f"98{rng.randrange(10 ** 8):08d}",
+            ))
+        return User.objects.bulk_create(users, batch_size=chunk_size)
+
+    def create_doctors(self, rng, doctor_users, chunk_size):
+        specializations = list(SPECIALIZATION_DESCRIPTIONS)
+        buildings = [choice for choice, _ in Doctor.BUILDING_CHOICES]
+        doctors = []
+        for i, user in enumerate(doctor_users):
+            available_from, available_to = rng.choice(WORKING_HOURS)
+            doctors.append(Doctor(
+                user=user,
+                specialization=specializations[i % len(specializations)],
+                appointment_fee=Decimal(rng.choice([300, 500, 800, 1000, 1500])),
+                available_from=available_from,
+                available_to=available_to,
+                building=rng.choice(buildings),
+                is_active=rng.random() > 0.05,
+                qualification=rng.choice(['MBBS', 'MBBS, MD', 'MBBS, MS', 'MD, PhD']),
+                experience_years=rng.randint(1, 35),
+                rating=Decimal(f"{rng.uniform(3.0, 5.0):.2f}"),
+            ))
+        return Doctor.objects.bulk_create(doctors, batch_size=chunk_size)
+
+    def generate_appointments(self, rng, doctors, patient_ids, first_day, last_day, today, target):
+        """
+        Yields appointments day by day. Each doctor books a random subset of
+        its 30-minute slots, so no doctor is double-booked, sized so the total
+        comes close to `target`.
+        """
+        if not doctors or not patient_ids:
+            return
+
+        days = (last_day - first_day).days + 1
+        per_doctor_day = target / (days * len(doctors))
+        slots_by_doctor = {
+            doctor.id: [
+                slot.time() for slot in (
+                    datetime.combine(today, doctor.available_from) + timedelta(minutes=SLOT_MINUTES * n)
+                    for n in range(
+                        int((datetime.combine(today, doctor.available_to) - datetime.combine(today, doctor.available_from))
+                            .total_seconds() // 60 // SLOT_MINUTES)
+                    )
+                )
+            ]
+            for doctor in doctors
+        }
+
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() == 5:
+                continue
+            status_mix = PAST_STATUS_MIX if day < today else FUTURE_STATUS_MIX
+            for doctor in doctors:
+                slots = slots_by_doctor[doctor.id]
+                booked = min(len(slots), int(per_doctor_day * 7 / 6 + rng.random()))
+                for slot in rng.sample(slots, booked):
+                    status = weighted_choice(rng, status_mix)
+                    yield Appointment(
+                        patient_id=rng.choice(patient_ids),
+                        doctor_id=doctor.id,
+                        date=day,
+                        time=slot,
+                        status=status,
+                        morning_reminder_sent=day < today,
+                        thirty_min_reminder_sent=day < today,
+                    )
@@ -2,15 +2,25 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.utils.timezone import localtime
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from core.models import Appointment
 from core.utils import send_infobip_sms
+from core.metrics import JOB_DURATION, REMINDER_LAG
 
 
 class Command(BaseCommand):
     help = 'Sends SMS reminders: morning (7-8 AM Nepal time) and 30 minutes before appointments.'
 
     def handle(self, *args, **options):
+        with JOB_DURATION.labels('send_reminders').time():
+            self.send_reminders()
+
+    def observe_reminder_lag(self, reminder, due):
+        """Records how late a reminder went out; early sends count as zero lag."""
+        lag = (timezone.now() - due).total_seconds()
+        REMINDER_LAG.labels(reminder).observe(max(lag, 0))
+
+    def send_reminders(self):
         now = localtime(timezone.now())
         today = now.date()
         current_time = now.time()
@@ -37,6 +47,7 @@ class Command(BaseCommand):
                 if appt.patient.phone_number and send_infobip_sms(appt.patient.phone_number, message):
                     appt.morning_reminder_sent = True
                     appt.save()
+                    self.observe_reminder_lag('morning', datetime.combine(today, time(7, 0), tzinfo=now.tzinfo))
                     self.stdout.write(
                         f"[OK] Sent morning reminder to {appt.patient.first_name} "
                         f"({appt.patient.phone_number}) for {appt.time.strftime('%I:%M %p')}"
@@ -81,6 +92,10 @@ class Command(BaseCommand):
             if appt.patient.phone_number and send_infobip_sms(appt.patient.phone_number, message):
                 appt.thirty_min_reminder_sent = True
                 appt.save()
+                self.observe_reminder_lag(
+                    'thirty_min',
+                    datetime.combine(appt.date, appt.time, tzinfo=now.tzinfo) - timedelta(minutes=30)
+                )
                 self.stdout.write(
                     f"[OK] Sent 30-min reminder to {appt.patient.first_name} "
                     f"({appt.patient.phone_number}) for {appt.time.strftime('%I:%M %p')}"
@@ -3,7 +3,10 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db.models import Q
 from core.models import Appointment
+from core.availability import record_slot_change
+from core.caching import appointment_tags, invalidate_tags
 from core.utils import send_infobip_sms
+from core.metrics import JOB_DURATION, NO_SHOW_SWEEP_SIZE
 import datetime
 
 class Command(BaseCommand):
@@ -28,6 +31,10 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        with JOB_DURATION.labels('update_missed_appointments').time():
+            self.update_missed_appointments(options)
+
+    def update_missed_appointments(self, options):
         script_start_time = timezone.now()
         grace_period = options['grace_period']
         dry_run = options['dry_run']
@@ -46,11 +53,13 @@ class Command(BaseCommand):
                 Q(date__lt=cutoff_time_naive.date()) |
                 Q(date=cutoff_time_naive.date(), time__lt=cutoff_time_naive.time())
             )
-        ).distinct()
+        )
         
         count = missed_appointments.count()
 
         if count == 0:
+            if not dry_run:
+                NO_SHOW_SWEEP_SIZE.observe(0)
             self.stdout.write(self.style.SUCCESS("No missed appointments to update. All good!"))
             return
 
@@ -68,7 +77,16 @@ class Command(BaseCommand):
         if notify_doctors:
             appointments_data_for_notif = list(missed_appointments) 
 
+        # QuerySet.update() sends no signals, so the cached views of these
+        # appointments are invalidated here.
+        missed_rows = list(missed_appointments.values_list('doctor_id', 'date', 'time', 'patient_id'))
         rows_updated = missed_appointments.update(status='no_show')
+        stale_tags = []
+        for doctor_id, day, slot, patient_id in missed_rows:
+            record_slot_change((doctor_id, day, slot, 'scheduled'), (doctor_id, day, slot, 'no_show'))
+            stale_tags += appointment_tags(doctor_id, patient_id)
+        invalidate_tags(*stale_tags)
+        NO_SHOW_SWEEP_SIZE.observe(rows_updated)
         
         self.stdout.write(self.style.SUCCESS(f"Successfully updated {rows_updated} appointments to 'No-Show' status."))
 
@@ -0,0 +1,50 @@
+# core/management/commands/warm_recommender.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.pinecone_utils import warm_up_recommender
+
+
+class Command(BaseCommand):
+    help = 'Loads the embedding model and pre-embeds symptom/condition phrases so the first AI recommendation after a deploy is not cold.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--combinations',
+            type=int,
+            default=10,
+            help='Number of pairwise symptom combinations to embed per specialization (default: 10)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=64,
+            help='Number of phrases embedded per forward pass (default: 64)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.EMBEDDING_CACHE_PATH:
+            self.stdout.write(self.style.WARNING(
+                "EMBEDDING_CACHE_PATH is not set - embeddings will only live in this process. "
+                "Set it so web workers can reuse them, or use RECOMMENDER_WARMUP_ON_STARTUP."
+            ))
+
+        report = warm_up_recommender(
+            combination_limit=options['combinations'],
+            batch_size=options['batch_size']
+        )
+
+        self.stdout.write(f"Model load:       {report['model_load_seconds']:.2f}s")
+        self.stdout.write(
+            f"Phrase embedding: {report['embedding_seconds']:.2f}s "
+            f"({report['phrases_embedded']} phrases)"
+        )
+        self.stdout.write(
+            f"Local index load: {report['index_load_seconds']:.2f}s "
+            f"({report['index_documents']} documents)"
+        )
+        cache = report['cache']
+        self.stdout.write(
+            f"Embedding cache:  {cache['size']}/{cache['max_size']} entries "
+            f"(hits={cache['hits']}, misses={cache['misses']}, persistent={cache['persistent']})"
+        )
+        self.stdout.write(self.style.SUCCESS("Recommender warm-up finished."))
@@ -0,0 +1,78 @@
+"""
+Prometheus metrics for the core app, served at /metrics.
+
+With PROMETHEUS_MULTIPROC_DIR set (before the process starts), every web
+worker and management command writes its samples to that directory and
+/metrics aggregates them, so counters from cron jobs such as
+send_reminders show up too. Without it, /metrics only reports the worker
+that answers the scrape.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency per view (URL name, which includes the DRF action).',
+    ['view', 'method', 'status'],
+)
+JOB_DURATION = Histogram(
+    'job_duration_seconds',
+    'Duration of management command jobs.',
+    ['job'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+BOOKING_CONFLICTS = Counter(
+    'booking_conflicts_total',
+    'Bookings rejected because the patient or the doctor slot was already taken.',
+    ['kind'],
+)
+SMS_MESSAGES = Counter(
+    'sms_messages_total',
+    'SMS sent through Infobip, by outcome.',
+    ['outcome'],
+)
+REMINDER_LAG = Histogram(
+    'reminder_lag_seconds',
+    'Time between when a reminder was due and when it was sent.',
+    ['reminder'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+NO_SHOW_SWEEP_SIZE = Histogram(
+    'no_show_sweep_size',
+    'Appointments marked as no-show per update_missed_appointments run.',
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+RECOMMENDATION_CACHE_LOOKUPS = Counter(
+    'recommendation_cache_lookups_total',
+    'Recommendation result cache lookups, by result (hit or miss).',
+    ['result'],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    'response_cache_lookups_total',
+    'Cached API response lookups, by view and result (hit or miss).',
+    ['view', 'result'],
+)
+SINGLE_FLIGHT_SHARED_RESULTS = Counter(
+    'single_flight_shared_results_total',
+    'Requests answered with a concurrent identical computation, from the same worker or through the cache.',
+    ['name', 'source'],
+)
+RECOMMENDATIONS_DEGRADED = Counter(
+    'recommendations_degraded_total',
+    'Recommendations answered keyword-only, because the client was over its rate (throttled) or the worker was at its inference limit (busy).',
+    ['reason'],
+)
+
+
+def collect_latest():
+    """Returns (body, content_type) for the /metrics response."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
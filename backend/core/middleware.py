@@ -0,0 +1,130 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from . import db_router
+from .caching import shared_cache
+from .db_router import primary_pin_key, replica_configured, view_uses_replica
+from .instrumentation import collect_metrics
+from .metrics import REQUEST_LATENCY
+
+logger = logging.getLogger('core.request_metrics')
+
+
+class RequestMetricsMiddleware:
+    """
+    For a REQUEST_METRICS_SAMPLE_RATE fraction of requests, records database
+    query count and time, cache hits and misses, and the time spent in the
+    phases instrumented with `core.instrumentation.timed` (embedding, vector
+    search, Infobip, serialization). The result is sent back as a
+    `Server-Timing` header and logged as one line on `core.request_metrics`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        db_stats = {'queries': 0, 'seconds': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_stats['queries'] += 1
+                db_stats['seconds'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with collect_metrics() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_queries))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        entries = [f'total;dur={total * 1000:.1f}']
+        fields = {'total_ms': round(total * 1000, 1)}
+        entries.append(f'db;dur={db_stats["seconds"] * 1000:.1f};desc="{db_stats["queries"]} queries"')
+        fields['db_queries'] = db_stats['queries']
+        fields['db_ms'] = round(db_stats['seconds'] * 1000, 1)
+        for name, (seconds, count) in metrics.timings.items():
+            entries.append(f'{name};dur={seconds * 1000:.1f};desc="{count} calls"')
+            fields[f'{name}_ms'] = round(seconds * 1000, 1)
+        for name, (hits, misses) in metrics.cache.items():
+            entries.append(f'{name};desc="{hits} hits, {misses} misses"')
+            fields[f'{name}_hits'] = hits
+            fields[f'{name}_misses'] = misses
+
+        response['Server-Timing'] = ', '.join(entries)
+        logger.info(
+            "%s %s %s %s", request.method, request.path, response.status_code,
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'metrics': dict(fields, method=request.method, path=request.path, status=response.status_code)}
+        )
+        return response
+
+
+class PrometheusMetricsMiddleware:
+    """Observes the latency of every request in `http_request_duration_seconds`, labelled by URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = (resolver_match.view_name or resolver_match.url_name) if resolver_match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(
+            time.perf_counter() - started
+        )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets GET/HEAD/OPTIONS requests to views marked `use_read_replica` read
+    from the replica (see `core.db_router.ReplicaRouter`). A client that just
+    wrote is pinned to the primary for REPLICA_LAG_SECONDS, so a patient who
+    books an appointment sees it on the next page load despite replica lag.
+    Only requests that wrote set a pin, and only clients with a token or
+    session are pinned (`core.db_router.primary_pin_key`).
+    The pin lives in the `default` cache, which must be shared by all
+    workers: the next request may reach a different one.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if replica_configured() and not shared_cache('default'):
+            raise ImproperlyConfigured(
+                "A read replica needs a cache shared by all workers for the primary pins; "
+                "set CACHE_BACKEND to 'file' or 'redis'."
+            )
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        with db_router.routing_request() as state:
+            response = self.get_response(request)
+
+        pin_key = primary_pin_key(request)
+        if state['wrote'] and pin_key:
+            cache.set(pin_key, True, timeout=settings.REPLICA_LAG_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not (replica_configured() and request.method in db_router.SAFE_METHODS and view_uses_replica(view_func)):
+            return
+        pin_key = primary_pin_key(request)
+        if not pin_key or not cache.get(pin_key):
+            db_router.allow_replica_reads()
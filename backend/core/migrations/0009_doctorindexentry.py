@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_doctor_building'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_id', models.PositiveBigIntegerField(unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
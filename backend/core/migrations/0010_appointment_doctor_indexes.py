@@ -0,0 +1,80 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(migrations.AddIndex):
+    """
+    CREATE INDEX CONCURRENTLY on PostgreSQL, so building an index on the
+    Appointment table does not block bookings; a plain AddIndex elsewhere.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            AddIndexConcurrently(self.model_name, self.index).database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            AddIndexConcurrently(self.model_name, self.index).database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # Concurrent index builds cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_doctorindexentry'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'status'], name='appt_doctor_date_status_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'time'], name='appt_patient_date_time_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('morning_reminder_sent', False), ('status', 'scheduled')), fields=['date'], name='appt_morning_reminder_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'scheduled'), ('thirty_min_reminder_sent', False)), fields=['date', 'time'], name='appt_thirty_min_reminder_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['date', 'time'], name='appt_scheduled_date_time_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['specialization'], name='doctor_active_spec_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-experience_years', '-rating'], name='doctor_active_top_idx'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.doctor'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='patient',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'role': 'patient'}, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_appointment_doctor_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={},
+        ),
+    ]
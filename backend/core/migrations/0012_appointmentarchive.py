@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_appointment_unordered'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No-Show')], max_length=10)),
+                ('qr_code', models.ImageField(blank=True, editable=False, null=True, upload_to='qr_codes/')),
+                ('morning_reminder_sent', models.BooleanField(default=False)),
+                ('thirty_min_reminder_sent', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('doctor_notes', models.TextField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='core.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
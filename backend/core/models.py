@@ -10,6 +10,7 @@ import qrcode
 from datetime import time, date
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.validators import RegexValidator
+from .metrics import BOOKING_CONFLICTS
 
 
 
@@ -86,6 +87,14 @@ class Doctor(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(5.0)]
     )
 
+    class Meta:
+        indexes = [
+            # Recommender and doctor list: active doctors of given specializations.
+            models.Index(fields=['specialization'], condition=models.Q(is_active=True), name='doctor_active_spec_idx'),
+            # Top-rated doctors.
+            models.Index(fields=['-experience_years', '-rating'], condition=models.Q(is_active=True), name='doctor_active_top_idx'),
+        ]
+
     def clean(self):
         if self.available_from >= self.available_to:
             raise ValidationError("Available from time must be before available to time.")
@@ -93,6 +102,24 @@ class Doctor(models.Model):
     def __str__(self):
         return f"Dr. {self.user.get_full_name()}"
 
+class AppointmentQuerySet(models.QuerySet):
+    """
+    Named scopes for the hot appointment queries. Each one filters on the
+    leading columns of an index in Appointment.Meta.indexes. Appointments have
+    no default ordering; callers that need one ask for it (`chronological()`).
+    """
+
+    def active(self):
+        """Appointments that occupy their slot."""
+        return self.filter(status__in=Appointment.ACTIVE_STATUSES)
+
+    def for_doctor_day(self, doctor, day):
+        return self.filter(doctor=doctor, date=day)
+
+    def chronological(self):
+        return self.order_by('date', 'time')
+
+
 class Appointment(models.Model):
     
     STATUS_CHOICES = (
@@ -101,14 +128,18 @@ class Appointment(models.Model):
         ('cancelled', 'Cancelled'),
         ('no_show', 'No-Show'), 
     )
+    # Statuses that keep a slot booked.
+    ACTIVE_STATUSES = ('scheduled', 'completed')
 
     patient = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
         related_name='appointments',
-        limit_choices_to={'role': 'patient'}
+        limit_choices_to={'role': 'patient'},
+        db_index=False
     )
-    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    # Both foreign keys are indexed as the leading column of the composite indexes below.
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, db_index=False)
     date = models.DateField()
     time = models.TimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='scheduled')
@@ -120,10 +151,28 @@ class Appointment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     doctor_notes = models.TextField(blank=True, null=True)
 
+    objects = AppointmentQuerySet.as_manager()
     
     class Meta:
-        
-        ordering = ['date', 'time']
+        indexes = [
+            # Booked slots, availability and the doctor double-booking check.
+            models.Index(fields=['doctor', 'date', 'status'], name='appt_doctor_date_status_idx'),
+            # Patient double-booking checks.
+            models.Index(fields=['patient', 'date', 'time'], name='appt_patient_date_time_idx'),
+            # send_reminders: only rows still waiting for a reminder are indexed.
+            models.Index(
+                fields=['date'],
+                condition=models.Q(status='scheduled', morning_reminder_sent=False),
+                name='appt_morning_reminder_idx'
+            ),
+            models.Index(
+                fields=['date', 'time'],
+                condition=models.Q(status='scheduled', thirty_min_reminder_sent=False),
+                name='appt_thirty_min_reminder_idx'
+            ),
+            # update_missed_appointments (no-show sweep).
+            models.Index(fields=['date', 'time'], condition=models.Q(status='scheduled'), name='appt_scheduled_date_time_idx'),
+        ]
 
     
 
@@ -144,27 +193,24 @@ class Appointment(models.Model):
                     )
 
             
-            existing_appointment_on_day = Appointment.objects.filter(
-                patient=self.patient,
-                doctor=self.doctor,
-                date=self.date,
-                status__in=['scheduled', 'completed']
+            existing_appointment_on_day = Appointment.objects.for_doctor_day(self.doctor, self.date).active().filter(
+                patient=self.patient
             )
             if existing_appointment_on_day.exists():
+                BOOKING_CONFLICTS.labels('same_day').inc()
                 raise ValidationError(
                     f"You already have an appointment scheduled with Dr. {self.doctor.user.get_full_name()} on {self.date.strftime('%B %d, %Y')}. "
                     "A patient can only have one appointment per doctor per day."
                 )
 
             
-            patient_time_conflicts = Appointment.objects.filter(
+            conflicting_appointment = Appointment.objects.active().filter(
                 patient=self.patient,
                 date=self.date,
-                time=self.time,
-                status__in=['scheduled', 'completed']
-            ).exclude(pk=self.pk)
-            if patient_time_conflicts.exists():
-                conflicting_appointment = patient_time_conflicts.first()
+                time=self.time
+            ).exclude(pk=self.pk).select_related('doctor__user').first()
+            if conflicting_appointment is not None:
+                BOOKING_CONFLICTS.labels('patient_time').inc()
                 raise ValidationError(
                     f"You already have an appointment scheduled at {self.time.strftime('%I:%M %p')} "
                     f"on {self.date.strftime('%B %d, %Y')} with Dr. {conflicting_appointment.doctor.user.get_full_name()}. "
@@ -172,13 +218,10 @@ class Appointment(models.Model):
                 )
                 
             
-            active_statuses = ['scheduled', 'completed']
-            if Appointment.objects.filter(
-                doctor=self.doctor, 
-                date=self.date, 
-                time=self.time,
-                status__in=active_statuses
+            if Appointment.objects.for_doctor_day(self.doctor, self.date).active().filter(
+                time=self.time
             ).exclude(pk=self.pk).exists():
+                BOOKING_CONFLICTS.labels('doctor_slot').inc()
                 raise ValidationError("This doctor is already booked for this time slot.")
             
             
@@ -272,4 +315,49 @@ class Appointment(models.Model):
         if self.is_past:
             return False
         
-        return self.status == 'scheduled'
\ No newline at end of file
+        return self.status == 'scheduled'
+
+class AppointmentArchive(models.Model):
+    """
+    Finished appointments moved out of the Appointment table by
+    `python manage.py archive_appointments`, keeping their original id.
+    Hot queries only ever see today's and future appointments plus recent
+    history; read APIs union this table in when asked for full history.
+    """
+    ARCHIVABLE_STATUSES = ('completed', 'cancelled', 'no_show')
+
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_appointments')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_appointments')
+    date = models.DateField()
+    time = models.TimeField()
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES)
+    qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True, editable=False)
+    morning_reminder_sent = models.BooleanField(default=False)
+    thirty_min_reminder_sent = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    doctor_notes = models.TextField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Archived appointments are always in the past.
+    is_past = True
+    is_today = False
+    is_upcoming = False
+    is_cancellable = False
+
+    def __str__(self):
+        return f"Archived appointment {self.id} on {self.date} at {self.time}"
+
+
+class DoctorIndexEntry(models.Model):
+    """
+    Content hash of the document last written to the vector index for a doctor.
+    Not a foreign key, so entries outlive deleted doctors until their vectors are removed.
+    """
+    doctor_id = models.PositiveBigIntegerField(unique=True)
+    content_hash = models.CharField(max_length=64)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Index entry for Doctor ID {self.doctor_id}"
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from langchain_core.embeddings import Embeddings
+
+ONNX_MODEL_FILENAME = 'model_quantized.onnx'
+TOKENIZER_FILENAME = 'tokenizer.json'
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """
+    Runs an int8-quantized ONNX export of a sentence-transformers MiniLM model
+    with onnxruntime on CPU. Produces mean-pooled, L2-normalized vectors like
+    the HuggingFace backend, without loading PyTorch.
+
+    `model_dir` must contain the files written by the `export_onnx_model`
+    management command.
+    """
+
+    def __init__(self, model_dir: str, num_threads: int = 1, max_length: int = 256, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                "EMBEDDING_BACKEND='onnx' requires the 'onnxruntime' and 'tokenizers' packages."
+            ) from e
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILENAME)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILENAME)
+        if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+            raise ImproperlyConfigured(
+                f"No ONNX model found in '{model_dir}'. Run 'python manage.py export_onnx_model' first."
+            )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(
+            None, {name: value for name, value in inputs.items() if name in self.input_names}
+        )[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).tolist()
+
+    def embed_documents(self, texts):
+        vectors = []
+        for offset in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[offset:offset + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str):
+        return self._embed_batch([text])[0]
@@ -1,41 +1,103 @@
-
-
 from django.conf import settings
-from langchain_huggingface import HuggingFaceEmbeddings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from langchain_pinecone import PineconeVectorStore
+from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_community.docstore.document import Document
-from .models import Doctor
+from .models import Doctor, DoctorIndexEntry
 from .specialization_data import SPECIALIZATION_DESCRIPTIONS
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .availability import annotate_next_free_slots, sort_by_availability
+from .log_utils import sampled_trace
+from .instrumentation import timed
+from .throttling import inference_slot
+import atexit
+import hashlib
+import json
+import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import defaultdict
+from itertools import combinations
 
 PINECONE_INDEX_NAME = "health-doctors-hf"
+EMBEDDING_MODEL_NAME = "multi-qa-MiniLM-L6-cos-v1"
+
+logger = logging.getLogger(__name__)
+
+# Doctors considered per specialization when ranking by availability.
+AVAILABILITY_CANDIDATES_PER_SPECIALIZATION = 10
+
+
+def build_embedding_provider(backend: str = None):
+    """
+    Loads the embedding model for the configured EMBEDDING_BACKEND
+    ('huggingface' or 'onnx'). Called lazily on the first cache miss.
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+
+    if backend == 'remote':
+        from .embedding_server import RemoteEmbeddings
+
+        return RemoteEmbeddings(
+            settings.EMBEDDING_SERVER_URL,
+            fallback_factory=build_embedding_provider
+        )
 
+    if backend == 'onnx':
+        from .onnx_embeddings import OnnxMiniLMEmbeddings
 
-embedding_model = HuggingFaceEmbeddings(
-    model_name="multi-qa-MiniLM-L6-cos-v1",
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
+        return OnnxMiniLMEmbeddings(
+            model_dir=settings.ONNX_MODEL_DIR,
+            num_threads=settings.EMBEDDING_NUM_THREADS
+        )
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+query_embedding_cache = EmbeddingCache(
+    max_size=settings.EMBEDDING_CACHE_SIZE,
+    path=settings.EMBEDDING_CACHE_PATH,
+    namespace=f"{EMBEDDING_MODEL_NAME}:{settings.EMBEDDING_BACKEND}"
 )
+atexit.register(query_embedding_cache.flush)
+
+def build_worker_embedding_provider():
+    """Uses the shared embedding server when EMBEDDING_SERVER_URL is set, else the in-process model."""
+    return build_embedding_provider('remote' if settings.EMBEDDING_SERVER_URL else None)
+
+
+embedding_model = CachedEmbeddings(build_worker_embedding_provider, query_embedding_cache)
 
 
 pinecone_vectorstore = None
+_local_index_loaded = False
 try:
-    if all([settings.PINECONE_API_KEY, settings.PINECONE_ENVIRONMENT]):
+    if settings.VECTOR_BACKEND == 'local':
+        pinecone_vectorstore = InMemoryVectorStore(embedding=embedding_model)
+        logger.info("Using local in-memory vector index for the AI feature.")
+    elif all([settings.PINECONE_API_KEY, settings.PINECONE_ENVIRONMENT]):
         pinecone_vectorstore = PineconeVectorStore.from_existing_index(
             index_name=PINECONE_INDEX_NAME, 
             embedding=embedding_model
         )
-        print("Pinecone vector store (Hugging Face) connected successfully.")
+        logger.info("Pinecone vector store (Hugging Face) connected successfully.")
     else:
-        print("Pinecone credentials missing. AI feature is disabled.")
+        logger.warning("Pinecone credentials missing. AI feature is disabled.")
 except Exception as e:
-    print(f"Error connecting to Pinecone: {e}. AI feature is disabled.")
+    logger.error("Error connecting to Pinecone: %s. AI feature is disabled.", e)
 
 
-def format_doctor_document(doctor: Doctor):
-    """Creates a LangChain Document with enhanced content for better matching."""
-    spec_data = SPECIALIZATION_DESCRIPTIONS.get(doctor.specialization, {})
+def format_specialization_passage(specialization: str) -> str:
+    """The text embedded for a specialization, built from SPECIALIZATION_DESCRIPTIONS."""
+    spec_data = SPECIALIZATION_DESCRIPTIONS.get(specialization, {})
     
     
     content_parts = []
@@ -63,14 +125,85 @@ def format_doctor_document(doctor: Doctor):
     comprehensive_description = ". ".join(content_parts)
     
     
-    content_to_embed = f"passage: {comprehensive_description}"
-    
+    return f"passage: {comprehensive_description}"
+
+
+def format_doctor_document(doctor: Doctor):
+    """Creates a LangChain Document with enhanced content for better matching."""
     metadata = {
         "doctor_id": str(doctor.id),
         "name": doctor.user.get_full_name(),
         "specialization": doctor.specialization,
     }
-    return Document(page_content=content_to_embed, metadata=metadata)
+    return Document(page_content=format_specialization_passage(doctor.specialization), metadata=metadata)
+
+
+def load_local_vector_index():
+    """
+    Fills the local in-memory index with every active doctor.
+    Only used when VECTOR_BACKEND is 'local'; returns the number of documents loaded.
+    """
+    global _local_index_loaded
+    if not isinstance(pinecone_vectorstore, InMemoryVectorStore):
+        return 0
+
+    active_doctors = Doctor.objects.filter(is_active=True).select_related('user')
+    documents = [format_doctor_document(doctor) for doctor in active_doctors]
+    if documents:
+        pinecone_vectorstore.add_documents(documents, ids=[doc.metadata['doctor_id'] for doc in documents])
+    _local_index_loaded = True
+    return len(documents)
+
+
+def ensure_local_vector_index():
+    if not _local_index_loaded and isinstance(pinecone_vectorstore, InMemoryVectorStore):
+        load_local_vector_index()
+
+
+def get_warmup_phrases(combination_limit: int = 10):
+    """
+    Symptom and condition phrases patients actually type, plus pairwise
+    combinations of the leading symptoms of each specialization.
+    """
+    phrases = []
+    for data in SPECIALIZATION_DESCRIPTIONS.values():
+        symptoms = data.get('symptoms_keywords', [])
+        phrases.extend(symptoms)
+        phrases.extend(data.get('conditions_treated', []))
+
+        pairs = combinations(symptoms, 2)
+        for _, (first, second) in zip(range(combination_limit), pairs):
+            phrases.append(f"{first} and {second}")
+
+    return list(dict.fromkeys(phrases))
+
+
+def warm_up_recommender(combination_limit: int = 10, batch_size: int = 64):
+    """
+    Loads the embedding model, pre-embeds the warm-up phrases into the query
+    embedding cache and preloads the local vector index.
+    Returns a dict of timings (seconds) and counts.
+    """
+    report = {}
+
+    start = time.perf_counter()
+    embedding_model.provider
+    report['model_load_seconds'] = time.perf_counter() - start
+
+    phrases = get_warmup_phrases(combination_limit)
+    queries = [f"query: {phrase}" for phrase in phrases]
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        embedding_model.embed_queries(queries[offset:offset + batch_size])
+    report['phrases_embedded'] = len(queries)
+    report['embedding_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report['index_documents'] = load_local_vector_index()
+    report['index_load_seconds'] = time.perf_counter() - start
+
+    report['cache'] = query_embedding_cache.stats()
+    return report
 
 
 def find_keyword_matches(user_query: str):
@@ -112,45 +245,49 @@ def find_keyword_matches(user_query: str):
         
         if score > 0:
             matches[spec] = min(score, 1.0)
-            print(f"Keyword match - {spec}: {matches[spec]:.4f} (matched: {matched_items[:2]})")
+            logger.debug("Keyword match - %s: %.4f (matched: %s)", spec, matches[spec], matched_items[:2])
     
     return matches
 
 
-def get_doctor_recommendations(user_query: str, top_k: int = 5, score_threshold: float = 0.7):
+def search_by_vector(query_vector, k, vectorstore=None):
+    """Runs a similarity search for an already-embedded query on the active vector store."""
+    vectorstore = vectorstore or pinecone_vectorstore
+    with timed('vector_search'):
+        if isinstance(vectorstore, InMemoryVectorStore):
+            return vectorstore.similarity_search_with_score_by_vector(query_vector, k=k)
+        return vectorstore.similarity_search_by_vector_with_score(query_vector, k=k)
+
+
+def vector_search_specializations(query_vector, top_k: int = 5, vectorstore=None):
+    """Vector search for an embedded query. Returns [(document, score)] best first."""
+    vector_results = []
+    try:
+        results_with_scores = search_by_vector(query_vector, k=top_k*2, vectorstore=vectorstore)
+        
+        for doc, score in results_with_scores:
+            logger.debug("Vector Score: %.4f | Spec: %s", score, doc.metadata.get('specialization'))
+            vector_results.append((doc, score))
+        
+    except Exception as e:
+        logger.warning("Vector search error: %s", e)
+    return vector_results
+
+
+def rank_specializations(keyword_matches, vector_results, score_threshold: float = 0.7):
     """
-    Enhanced recommendation system combining keyword + vector search
+    Combines keyword and vector scores per specialization and keeps those above
+    the adaptive threshold. Returns [(specialization, score)] best first.
     """
-    print(f"\n--- ENHANCED DEBUGGING ---")
-    print(f"User Query: {user_query}")
-    
-    
-    keyword_matches = find_keyword_matches(user_query)
-    
-    
     vector_matches = {}
-    vector_results = []
-    
-    if pinecone_vectorstore is not None:
-        try:
-            prefixed_query = f"query: {user_query}"
-            results_with_scores = pinecone_vectorstore.similarity_search_with_score(prefixed_query, k=top_k*2)
-            
-            print("\n--- VECTOR SEARCH RESULTS ---")
-            for doc, score in results_with_scores:
-                spec = doc.metadata.get('specialization')
-                vector_matches[spec] = max(vector_matches.get(spec, 0), score)  
-                print(f"  Vector Score: {score:.4f} | Spec: {spec}")
-                vector_results.append((doc, score))
-            
-        except Exception as e:
-            print(f"Vector search error: {e}")
+    for doc, score in vector_results:
+        spec = doc.metadata.get('specialization')
+        vector_matches[spec] = max(vector_matches.get(spec, 0), score)  
     
     
     all_specializations = set(keyword_matches.keys()) | set(vector_matches.keys())
     combined_scores = {}
     
-    print(f"\n--- COMBINED SCORING ---")
     for spec in all_specializations:
         keyword_score = keyword_matches.get(spec, 0)
         vector_score = vector_matches.get(spec, 0)
@@ -170,46 +307,192 @@ def get_doctor_recommendations(user_query: str, top_k: int = 5, score_threshold:
             combined_score = vector_score * 0.8
         
         combined_scores[spec] = min(combined_score, 1.0)
-        print(f"  {spec}: keyword={keyword_score:.3f}, vector={vector_score:.3f} → combined={combined_score:.4f}")
+        logger.debug("%s: keyword=%.3f, vector=%.3f → combined=%.4f", spec, keyword_score, vector_score, combined_score)
     
     
     adaptive_threshold = calculate_adaptive_threshold(combined_scores, score_threshold)
-    print(f"\nAdaptive Threshold: {adaptive_threshold:.4f} (original: {score_threshold})")
+    logger.debug("Adaptive Threshold: %.4f (original: %s)", adaptive_threshold, score_threshold)
     
     
     qualifying_specs = [(spec, score) for spec, score in combined_scores.items() 
                        if score >= adaptive_threshold]
     qualifying_specs.sort(key=lambda x: x[1], reverse=True)
     
-    print(f"\nQualifying Specializations:")
-    for spec, score in qualifying_specs:
-        print(f"  {spec}: {score:.4f}")
+    logger.debug("Qualifying Specializations: %s", qualifying_specs)
+    
+    return qualifying_specs
+
+
+def score_specializations(user_query: str, query_vector=None, top_k: int = 5, score_threshold: float = 0.7):
+    """
+    Combines keyword and vector scores for a single query.
+    Returns (keyword_matches, vector_results, qualifying_specs), with
+    qualifying_specs sorted by combined score.
+    """
+    logger.debug("User Query: %s", user_query)
     
+    keyword_matches = find_keyword_matches(user_query)
+    vector_results = []
+    if query_vector is not None:
+        vector_results = vector_search_specializations(query_vector, top_k)
     
+    qualifying_specs = rank_specializations(keyword_matches, vector_results, score_threshold)
+    return keyword_matches, vector_results, qualifying_specs
+
+
+def candidate_specializations(keyword_matches, vector_results, qualifying_specs):
+    """Every specialization the selection step or the first two fallbacks may need doctors for."""
+    specializations = {spec for spec, _ in qualifying_specs}
+    if keyword_matches:
+        specializations.add(max(keyword_matches.items(), key=lambda x: x[1])[0])
+    if vector_results:
+        specializations.add(vector_results[0][0].metadata.get('specialization'))
+    return specializations
+
+
+def fetch_doctors_by_specialization(specializations, per_specialization: int = 2):
+    """
+    Loads the first `per_specialization` active doctors of every given
+    specialization in one window-function query, grouped by specialization.
+    """
+    doctors_by_spec = defaultdict(list)
+    if not specializations:
+        return doctors_by_spec
+    
+    doctors = Doctor.objects.filter(
+        specialization__in=specializations,
+        is_active=True
+    ).annotate(
+        specialization_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('specialization')],
+            order_by=F('id').asc()
+        )
+    ).filter(
+        specialization_rank__lte=per_specialization
+    ).select_related('user').order_by('specialization', 'specialization_rank')
+    
+    for doctor in doctors:
+        doctors_by_spec[doctor.specialization].append(doctor)
+    return doctors_by_spec
+
+
+def select_recommended_doctors(keyword_matches, vector_results, qualifying_specs, doctors_by_spec, top_k):
+    """Picks up to two doctors per qualifying specialization, falling back when none qualify."""
     recommended_doctors = []
-    used_specializations = set()
     
     for spec, score in qualifying_specs:
-        if spec not in used_specializations:
-            doctors = Doctor.objects.filter(specialization=spec, is_active=True)
-            if doctors.exists():
-                
-                spec_doctors = list(doctors[:2])
-                recommended_doctors.extend(spec_doctors)
-                used_specializations.add(spec)
-                print(f"  Added {len(spec_doctors)} doctors from {spec}")
-                
-                if len(recommended_doctors) >= top_k:
-                    break
+        spec_doctors = doctors_by_spec.get(spec, [])[:2]
+        if spec_doctors:
+            recommended_doctors.extend(spec_doctors)
+            logger.debug("Added %d doctors from %s", len(spec_doctors), spec)
+            
+            if len(recommended_doctors) >= top_k:
+                break
     
     
     if not recommended_doctors:
-        recommended_doctors = apply_fallbacks(keyword_matches, vector_results, top_k)
+        recommended_doctors = apply_fallbacks(keyword_matches, vector_results, top_k, doctors_by_spec)
     
-    print(f"--- END ENHANCED DEBUGGING ---\n")
     return recommended_doctors[:top_k]
 
 
+@sampled_trace()
+def get_doctor_recommendations_with_scores(user_query: str, top_k: int = 5, score_threshold: float = 0.7,
+                                           availability_days: int = None, keyword_only: bool = False):
+    """
+    Same as `get_doctor_recommendations`, but returns
+    (recommended_doctors, qualifying_specs, vector_search_ok) so callers can
+    cache the ranking and tell a degraded keyword-only result apart.
+    """
+    query_vector = None
+    with inference_slot(pinecone_vectorstore is not None and not keyword_only) as admitted:
+        if admitted:
+            try:
+                ensure_local_vector_index()
+                with timed('embedding'):
+                    query_vector = embedding_model.embed_query(f"query: {user_query}")
+            except Exception as e:
+                logger.warning("Vector search error: %s", e)
+        
+        keyword_matches, vector_results, qualifying_specs = score_specializations(
+            user_query, query_vector, top_k, score_threshold
+        )
+    per_specialization = max(2, top_k)
+    if availability_days:
+        per_specialization = max(per_specialization, AVAILABILITY_CANDIDATES_PER_SPECIALIZATION)
+    doctors_by_spec = fetch_doctors_by_specialization(
+        candidate_specializations(keyword_matches, vector_results, qualifying_specs),
+        per_specialization=per_specialization
+    )
+    
+    if availability_days:
+        annotate_next_free_slots(
+            [doctor for doctors in doctors_by_spec.values() for doctor in doctors],
+            availability_days
+        )
+        for spec, doctors in doctors_by_spec.items():
+            doctors_by_spec[spec] = sort_by_availability(doctors)
+    
+    recommended_doctors = select_recommended_doctors(
+        keyword_matches, vector_results, qualifying_specs, doctors_by_spec, top_k
+    )
+    if availability_days:
+        annotate_next_free_slots(recommended_doctors, availability_days)
+    
+    vector_search_ok = pinecone_vectorstore is None or bool(vector_results)
+    return recommended_doctors, qualifying_specs, vector_search_ok
+
+
+def get_doctor_recommendations(user_query: str, top_k: int = 5, score_threshold: float = 0.7,
+                               availability_days: int = None, keyword_only: bool = False):
+    """
+    Enhanced recommendation system combining keyword + vector search.
+    With `availability_days`, doctors within each specialization are ranked by
+    their earliest free slot in that many days, exposed as `next_available_slot`.
+    With `keyword_only` (or when the worker's inference slots are all busy),
+    only `find_keyword_matches` is used.
+    """
+    recommended_doctors, _, _ = get_doctor_recommendations_with_scores(
+        user_query, top_k, score_threshold, availability_days, keyword_only
+    )
+    return recommended_doctors
+
+
+@sampled_trace()
+def get_batch_doctor_recommendations(user_queries, top_k: int = 5, score_threshold: float = 0.7,
+                                     keyword_only: bool = False):
+    """
+    Recommendations for many queries at once. All queries are embedded in one
+    batched forward pass and doctors for the union of their specializations
+    are loaded with a single query. Returns one doctor list per query.
+    """
+    query_vectors = [None] * len(user_queries)
+    with inference_slot(pinecone_vectorstore is not None and not keyword_only) as admitted:
+        if admitted:
+            try:
+                ensure_local_vector_index()
+                with timed('embedding'):
+                    query_vectors = embedding_model.embed_queries([f"query: {query}" for query in user_queries])
+            except Exception as e:
+                logger.warning("Batch embedding error: %s", e)
+        
+        scored = [
+            score_specializations(query, query_vector, top_k, score_threshold)
+            for query, query_vector in zip(user_queries, query_vectors)
+        ]
+    
+    specializations = set()
+    for keyword_matches, vector_results, qualifying_specs in scored:
+        specializations |= candidate_specializations(keyword_matches, vector_results, qualifying_specs)
+    doctors_by_spec = fetch_doctors_by_specialization(specializations, per_specialization=max(2, top_k))
+    
+    return [
+        select_recommended_doctors(keyword_matches, vector_results, qualifying_specs, doctors_by_spec, top_k)
+        for keyword_matches, vector_results, qualifying_specs in scored
+    ]
+
+
 def calculate_adaptive_threshold(combined_scores, original_threshold):
     """
     Calculate an adaptive threshold based on the score distribution
@@ -230,61 +513,92 @@ def calculate_adaptive_threshold(combined_scores, original_threshold):
     return original_threshold
 
 
-def apply_fallbacks(keyword_matches, vector_results, top_k):
+def apply_fallbacks(keyword_matches, vector_results, top_k, doctors_by_spec=None):
     """
     Apply fallback strategies when primary matching fails
     """
-    print("Applying fallback strategies...")
+    logger.debug("Applying fallback strategies...")
+    if doctors_by_spec is None:
+        doctors_by_spec = fetch_doctors_by_specialization(
+            candidate_specializations(keyword_matches, vector_results, []),
+            per_specialization=top_k
+        )
     
     
     if keyword_matches:
         best_spec = max(keyword_matches.items(), key=lambda x: x[1])[0]
-        doctors = Doctor.objects.filter(specialization=best_spec, is_active=True)
-        if doctors.exists():
-            print(f"Fallback 1: Using best keyword match - {best_spec}")
-            return list(doctors[:top_k])
+        doctors = doctors_by_spec.get(best_spec)
+        if doctors:
+            logger.debug("Fallback 1: Using best keyword match - %s", best_spec)
+            return doctors[:top_k]
     
     
     if vector_results:
         best_doc, _ = vector_results[0]
         best_spec = best_doc.metadata.get('specialization')
-        doctors = Doctor.objects.filter(specialization=best_spec, is_active=True)
-        if doctors.exists():
-            print(f"Fallback 2: Using best vector match - {best_spec}")
-            return list(doctors[:top_k])
+        doctors = doctors_by_spec.get(best_spec)
+        if doctors:
+            logger.debug("Fallback 2: Using best vector match - %s", best_spec)
+            return doctors[:top_k]
     
     
-    general_doctors = Doctor.objects.filter(
+    general_doctors = list(Doctor.objects.filter(
         specialization__icontains='General', 
         is_active=True
-    )
-    if general_doctors.exists():
-        print("Fallback 3: Using General Practitioners")
-        return list(general_doctors[:top_k])
+    ).select_related('user').order_by('id')[:top_k])
+    if general_doctors:
+        logger.debug("Fallback 3: Using General Practitioners")
+        return general_doctors
     
     
-    print("Fallback 4: Using any active doctors")
-    return list(Doctor.objects.filter(is_active=True)[:top_k])
+    logger.debug("Fallback 4: Using any active doctors")
+    return list(Doctor.objects.filter(is_active=True).select_related('user').order_by('id')[:top_k])
 
 
 
+def document_content_hash(document: Document) -> str:
+    """Hash of everything that ends up in the index for a document: embedded text and metadata."""
+    payload = json.dumps({'content': document.page_content, 'metadata': document.metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def tracks_index_state() -> bool:
+    """
+    Content hashes are only kept for the shared Pinecone index; the local
+    in-memory index is rebuilt in every process.
+    """
+    return pinecone_vectorstore is not None and not isinstance(pinecone_vectorstore, InMemoryVectorStore)
+
+
+def record_index_entries(hashes_by_doctor_id):
+    DoctorIndexEntry.objects.bulk_create(
+        [DoctorIndexEntry(doctor_id=doctor_id, content_hash=content_hash)
+         for doctor_id, content_hash in hashes_by_doctor_id.items()],
+        update_conflicts=True,
+        unique_fields=['doctor_id'],
+        update_fields=['content_hash', 'indexed_at']
+    )
+
+
 def upsert_doctor(doctor_id: int):
     """Upserts a single doctor to the Pinecone index with enhanced content."""
     if pinecone_vectorstore is None:
         return
 
     try:
-        doctor = Doctor.objects.get(pk=doctor_id)
+        doctor = Doctor.objects.select_related('user').get(pk=doctor_id)
         if doctor.is_active:
             document = format_doctor_document(doctor)  
             pinecone_vectorstore.add_documents([document], ids=[str(doctor.id)])
-            print(f"Successfully upserted Doctor ID: {doctor.id} to Pinecone with enhanced content.")
+            if tracks_index_state():
+                record_index_entries({doctor.id: document_content_hash(document)})
+            logger.info("Upserted Doctor ID: %s to Pinecone.", doctor.id)
         else:
             delete_doctor(doctor_id)
     except Doctor.DoesNotExist:
-        print(f"Doctor with ID {doctor_id} not found for upserting.")
+        logger.warning("Doctor with ID %s not found for upserting.", doctor_id)
     except Exception as e:
-        print(f"Error upserting doctor {doctor_id}: {e}")
+        logger.exception("Error upserting doctor %s", doctor_id)
 
 
 def delete_doctor(doctor_id: int):
@@ -293,31 +607,152 @@ def delete_doctor(doctor_id: int):
         return
     try:
         pinecone_vectorstore.delete(ids=[str(doctor_id)])
-        print(f"Successfully deleted Doctor ID: {doctor_id} from Pinecone.")
+        DoctorIndexEntry.objects.filter(doctor_id=doctor_id).delete()
+        logger.info("Deleted Doctor ID: %s from Pinecone.", doctor_id)
+    except Exception as e:
+        logger.exception("Error deleting doctor %s", doctor_id)
+
+
+def _with_retries(operation, max_retries: int):
+    """Runs `operation`, retrying with exponential backoff (0.5s, 1s, 2s, ...)."""
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def _run_batches(operation, batches, workers: int):
+    """
+    Yields (batch, error) for every batch as it finishes, running up to
+    `workers` batches in parallel. A single worker runs inline.
+    """
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            try:
+                operation(batch)
+                yield batch, None
+            except Exception as e:
+                yield batch, e
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(operation, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            yield futures[future], future.exception()
+
+
+def indexed_doctor_ids():
+    """
+    Ids of every doctor vector in the Pinecone index, or None if the index
+    cannot list its ids (pod-based indexes).
+    """
+    try:
+        return {int(vector_id) for page in pinecone_vectorstore.index.list() for vector_id in page
+                if vector_id.isdigit()}
     except Exception as e:
-        print(f"Error deleting doctor {doctor_id}: {e}")
+        logger.warning("Could not list the ids in the vector index: %s", e)
+        return None
+
+
+def reindex_doctors(batch_size: int = 100, workers: int = 4, max_retries: int = 3,
+                    full: bool = False, dry_run: bool = False, doctor_ids=None):
+    """
+    Brings the vector index in line with the database by content hash.
+
+    Only new or changed active doctors are embedded and upserted, and doctors
+    that were deactivated or deleted since they were indexed are removed.
+    Work is split into batches of `batch_size` uploaded by `workers` threads,
+    each retried up to `max_retries` times. `full` ignores stored hashes and
+    also removes vectors of inactive or unknown doctors that have no index
+    entry (indexed before entries were kept). `doctor_ids` limits the sync
+    to those doctors.
+    Returns a report dict of counts and failed doctor ids.
+    """
+    report = {'upserted': 0, 'deleted': 0, 'unchanged': 0, 'failed': [], 'dry_run': dry_run}
+    if pinecone_vectorstore is None:
+        return report
+
+    entries = DoctorIndexEntry.objects.all()
+    doctors = Doctor.objects.filter(is_active=True)
+    if doctor_ids is not None:
+        entries = entries.filter(doctor_id__in=doctor_ids)
+        doctors = doctors.filter(id__in=doctor_ids)
+
+    indexed_hashes = {} if full else dict(entries.values_list('doctor_id', 'content_hash'))
+
+    changed_documents = []
+    active_ids = set()
+    for doctor in doctors.select_related('user').order_by('id'):
+        active_ids.add(doctor.id)
+        document = format_doctor_document(doctor)
+        content_hash = document_content_hash(document)
+        if indexed_hashes.get(doctor.id) == content_hash:
+            report['unchanged'] += 1
+        else:
+            changed_documents.append((doctor.id, document, content_hash))
+
+    if doctor_ids is not None:
+        stale_ids = sorted(set(doctor_ids) - active_ids)
+    else:
+        known_ids = set(entries.values_list('doctor_id', flat=True))
+        if full:
+            known_ids |= indexed_doctor_ids() or set()
+        stale_ids = sorted(known_ids - active_ids)
+
+    if dry_run:
+        report['upserted'] = len(changed_documents)
+        report['deleted'] = len(stale_ids)
+        return report
+
+    def upsert_batch(batch):
+        _with_retries(
+            lambda: pinecone_vectorstore.add_documents(
+                [document for _, document, _ in batch],
+                ids=[str(doctor_id) for doctor_id, _, _ in batch]
+            ),
+            max_retries
+        )
+
+    def delete_batch(batch):
+        _with_retries(lambda: pinecone_vectorstore.delete(ids=[str(doctor_id) for doctor_id in batch]), max_retries)
+
+    upsert_batches = [changed_documents[i:i + batch_size] for i in range(0, len(changed_documents), batch_size)]
+    delete_batches = [stale_ids[i:i + batch_size] for i in range(0, len(stale_ids), batch_size)]
+
+    for batch, error in _run_batches(upsert_batch, upsert_batches, workers):
+        if error is not None:
+            logger.error("Error upserting batch of %d doctors: %s", len(batch), error)
+            report['failed'].extend(doctor_id for doctor_id, _, _ in batch)
+            continue
+        if tracks_index_state():
+            record_index_entries({doctor_id: content_hash for doctor_id, _, content_hash in batch})
+        report['upserted'] += len(batch)
+
+    for batch, error in _run_batches(delete_batch, delete_batches, workers):
+        if error is not None:
+            logger.error("Error deleting batch of %d doctors: %s", len(batch), error)
+            report['failed'].extend(batch)
+            continue
+        DoctorIndexEntry.objects.filter(doctor_id__in=batch).delete()
+        report['deleted'] += len(batch)
+
+    return report
 
 
 def bulk_upsert_all_doctors():
     """
-    Utility function to re-index all doctors with enhanced content
-    Run this once to update your existing Pinecone index
+    Utility function to re-index all doctors with enhanced content.
+    Only changed doctors are re-embedded; see `reindex_doctors`.
     """
     if pinecone_vectorstore is None:
-        print("Pinecone not available for bulk upsert")
+        logger.warning("Pinecone not available for bulk upsert")
         return
     
-    active_doctors = Doctor.objects.filter(is_active=True)
-    documents = []
-    ids = []
-    
-    for doctor in active_doctors:
-        document = format_doctor_document(doctor)
-        documents.append(document)
-        ids.append(str(doctor.id))
-    
-    try:
-        pinecone_vectorstore.add_documents(documents, ids=ids)
-        print(f"Successfully bulk upserted {len(documents)} doctors with enhanced content.")
-    except Exception as e:
-        print(f"Error in bulk upsert: {e}")
\ No newline at end of file
+    report = reindex_doctors()
+    logger.info(
+        "Reindex finished: %s upserted, %s deleted, %s unchanged, %d failed.",
+        report['upserted'], report['deleted'], report['unchanged'], len(report['failed'])
+    )
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import DOCTOR_SET_TAG, entry_timeout, tag_versions
+from .embedding_cache import normalize_query_text
+from .instrumentation import record_cache_lookup, timed
+from .metrics import RECOMMENDATION_CACHE_LOOKUPS
+from .models import Doctor
+from .pinecone_utils import get_doctor_recommendations_with_scores
+from .serializers import DoctorSerializer
+from .single_flight import single_flight
+
+_snapshot_lock = threading.Lock()
+_doctor_snapshot = {'version': None, 'expires': 0.0, 'doctors': {}}
+
+
+def get_doctor_set_version() -> int:
+    """
+    Version of the `doctor-set` cache tag. The Doctor and doctor User signals
+    bump it once their transaction commits, which invalidates every cached
+    recommendation and doctor snapshot.
+    """
+    return tag_versions([DOCTOR_SET_TAG])[DOCTOR_SET_TAG]
+
+
+def _result_key(version, user_query, top_k, score_threshold):
+    digest = hashlib.sha1(normalize_query_text(user_query).encode('utf-8')).hexdigest()
+    return f"recommendations:v{version}:{top_k}:{score_threshold}:{digest}"
+
+
+def _snapshot_for(version):
+    """
+    This worker's serialized doctors for `version`. Kept no longer than a
+    cached result: with a per-process cache, another worker's doctor changes
+    never bump the version seen here.
+    """
+    now = time.monotonic()
+    with _snapshot_lock:
+        if _doctor_snapshot['version'] != version or now >= _doctor_snapshot['expires']:
+            _doctor_snapshot['version'] = version
+            _doctor_snapshot['expires'] = now + entry_timeout(settings.RECOMMENDATION_CACHE_TIMEOUT, 'default')
+            _doctor_snapshot['doctors'] = {}
+        return _doctor_snapshot['doctors']
+
+
+def _remember_doctors(version, doctors):
+    snapshot = _snapshot_for(version)
+    with timed('serialize'):
+        serialized = DoctorSerializer(doctors, many=True).data
+    for doctor, data in zip(doctors, serialized):
+        snapshot[doctor.id] = data
+
+
+def _snapshot_doctors(version, doctor_ids):
+    """Serialized doctors for `doctor_ids`, loading only ones this worker has not seen in one query."""
+    snapshot = _snapshot_for(version)
+    missing_ids = [doctor_id for doctor_id in doctor_ids if doctor_id not in snapshot]
+    if missing_ids:
+        _remember_doctors(
+            version,
+            list(Doctor.objects.filter(id__in=missing_ids).select_related('user'))
+        )
+    return [snapshot[doctor_id] for doctor_id in doctor_ids if doctor_id in snapshot]
+
+
+def get_cached_recommendations(user_query: str, top_k: int = 5, score_threshold: float = 0.7,
+                               keyword_only: bool = False):
+    """
+    Serialized doctor recommendations for `user_query`.
+
+    Results are cached per normalized query and `top_k` as specialization
+    scores plus doctor ids, under the current doctor-set version. A repeat
+    query is answered from the cache and the doctor snapshot without
+    embedding, vector search or database access (for LOCAL_CACHE_TIMEOUT
+    seconds with a per-process cache); identical queries arriving
+    together on a miss share one computation. With `keyword_only`, a miss
+    skips embedding and vector search; such degraded results are not cached.
+    """
+    version = get_doctor_set_version()
+    key = _result_key(version, user_query, top_k, score_threshold)
+
+    cached = cache.get(key)
+    record_cache_lookup('recommendation_cache', cached is not None)
+    RECOMMENDATION_CACHE_LOOKUPS.labels('hit' if cached is not None else 'miss').inc()
+    if cached is not None:
+        return _snapshot_doctors(version, cached['doctor_ids'])
+
+    def recommend():
+        doctors, qualifying_specs, vector_search_ok = get_doctor_recommendations_with_scores(
+            user_query, top_k, score_threshold, keyword_only=keyword_only
+        )
+        _remember_doctors(version, doctors)
+
+        if vector_search_ok:
+            cache.set(key, {
+                'scores': qualifying_specs,
+                'doctor_ids': [doctor.id for doctor in doctors],
+            }, timeout=entry_timeout(settings.RECOMMENDATION_CACHE_TIMEOUT, 'default'))
+        return [doctor.id for doctor in doctors]
+
+    flight_key = f"{key}:keyword-only" if keyword_only else key
+    return _snapshot_doctors(version, single_flight('recommendation', flight_key, recommend))
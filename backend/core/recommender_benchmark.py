@@ -0,0 +1,140 @@
+"""
+Offline accuracy and latency benchmark for the AI doctor recommender.
+
+Runs labeled symptom queries through each stage of the recommendation
+pipeline against a local in-memory vector index (one document per
+specialization), so it needs no Pinecone access.
+"""
+import time
+
+from langchain_community.docstore.document import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from . import pinecone_utils
+from .bench_utils import summarize
+from .specialization_data import SPECIALIZATION_DESCRIPTIONS
+
+# (query, acceptable specializations). The first specialization listed is the
+# preferred answer, but any listed one counts as correct.
+BENCHMARK_QUERIES = [
+    ("I have chest pain when climbing stairs", ["Cardiology"]),
+    ("my heart is racing and skipping beats", ["Cardiology"]),
+    ("high blood pressure readings at home", ["Cardiology", "General Physician"]),
+    ("swollen ankles and out of breath lying down", ["Cardiology"]),
+    ("itchy red rash on my arms", ["Dermatology", "Allergist"]),
+    ("a mole on my back changed colour", ["Dermatology", "Oncology"]),
+    ("bad acne on face and back", ["Dermatology"]),
+    ("my hair is falling out in patches", ["Dermatology"]),
+    ("sore throat and pain when swallowing", ["ENT(Otolaryngology)"]),
+    ("ringing in my ears that won't stop", ["ENT(Otolaryngology)"]),
+    ("blocked sinuses and facial pressure", ["ENT(Otolaryngology)", "Allergist"]),
+    ("loud snoring and I stop breathing at night", ["ENT(Otolaryngology)"]),
+    ("very painful periods every month", ["Gynecology"]),
+    ("irregular periods and hot flashes", ["Gynecology"]),
+    ("need a pap smear", ["Gynecology"]),
+    ("severe migraine with flashing lights", ["Neurology"]),
+    ("numbness and tingling in my hands", ["Neurology"]),
+    ("had a seizure yesterday", ["Neurology"]),
+    ("my hands shake and memory is getting worse", ["Neurology"]),
+    ("knee pain after running", ["Orthopedics", "Physical Therapy"]),
+    ("I think I broke my wrist", ["Orthopedics"]),
+    ("lower back pain for weeks", ["Orthopedics", "Physical Therapy"]),
+    ("shoulder hurts when lifting my arm", ["Orthopedics", "Physical Therapy"]),
+    ("my child has a fever and cough", ["Pediatrics"]),
+    ("baby is vomiting and has diarrhea", ["Pediatrics"]),
+    ("toddler vaccination schedule", ["Pediatrics", "General Physician"]),
+    ("rehab after knee surgery", ["Physical Therapy", "Orthopedics"]),
+    ("want to regain strength and improve mobility", ["Physical Therapy"]),
+    ("sneezing and itchy watery eyes every spring", ["Allergist"]),
+    ("hives after eating peanuts", ["Allergist"]),
+    ("annual physical check-up", ["General Physician"]),
+    ("need a flu shot", ["General Physician"]),
+    ("just not feeling well lately", ["General Physician"]),
+    ("unexplained weight loss and night sweats", ["Oncology"]),
+    ("found a lump in my breast", ["Oncology", "Gynecology"]),
+    ("persistent fatigue and a lump in my neck", ["Oncology", "ENT(Otolaryngology)"]),
+]
+
+STAGES = ('keyword', 'embedding', 'vector_search', 'scoring', 'db_resolution', 'total')
+
+
+def build_specialization_index(embedding_provider):
+    """A local index with one passage per specialization, embedded like the doctor documents."""
+    vectorstore = InMemoryVectorStore(embedding=embedding_provider)
+    specializations = list(SPECIALIZATION_DESCRIPTIONS)
+    documents = [
+        Document(
+            page_content=pinecone_utils.format_specialization_passage(spec),
+            metadata={'specialization': spec}
+        )
+        for spec in specializations
+    ]
+    vectorstore.add_documents(documents, ids=specializations)
+    return vectorstore
+
+
+def run_benchmark(embedding_provider, queries=BENCHMARK_QUERIES, repeat: int = 3,
+                  top_k: int = 3, score_threshold: float = 0.7):
+    """
+    Measures top-1/top-3 accuracy of the specialization ranking and per-stage
+    latency over `repeat` passes. Embeddings are computed by
+    `embedding_provider` directly, bypassing the query cache, so embedding
+    latency is the cold cost. Returns a JSON-serializable dict.
+    """
+    vectorstore = build_specialization_index(embedding_provider)
+    timings = {stage: [] for stage in STAGES}
+    top1_hits = top3_hits = 0
+    misses = []
+
+    started = time.perf_counter()
+    for pass_number in range(repeat):
+        for query, expected in queries:
+            t0 = time.perf_counter()
+            keyword_matches = pinecone_utils.find_keyword_matches(query)
+            t1 = time.perf_counter()
+            query_vector = embedding_provider.embed_query(f"query: {query}")
+            t2 = time.perf_counter()
+            vector_results = pinecone_utils.vector_search_specializations(
+                query_vector, top_k, vectorstore=vectorstore
+            )
+            t3 = time.perf_counter()
+            qualifying_specs = pinecone_utils.rank_specializations(
+                keyword_matches, vector_results, score_threshold
+            )
+            t4 = time.perf_counter()
+            doctors_by_spec = pinecone_utils.fetch_doctors_by_specialization(
+                pinecone_utils.candidate_specializations(keyword_matches, vector_results, qualifying_specs),
+                per_specialization=max(2, top_k)
+            )
+            pinecone_utils.select_recommended_doctors(
+                keyword_matches, vector_results, qualifying_specs, doctors_by_spec, top_k
+            )
+            t5 = time.perf_counter()
+
+            for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t5 - t0)):
+                timings[stage].append(elapsed)
+
+            if pass_number == 0:
+                ranked = [spec for spec, _ in qualifying_specs]
+                if ranked[:1] and ranked[0] in expected:
+                    top1_hits += 1
+                if any(spec in expected for spec in ranked[:3]):
+                    top3_hits += 1
+                else:
+                    misses.append({'query': query, 'expected': expected, 'ranked': ranked[:3]})
+    elapsed_total = time.perf_counter() - started
+
+    runs = len(queries) * repeat
+    return {
+        'dataset_size': len(queries),
+        'repeat': repeat,
+        'top_k': top_k,
+        'score_threshold': score_threshold,
+        'accuracy': {
+            'top1': round(top1_hits / len(queries), 4),
+            'top3': round(top3_hits / len(queries), 4),
+        },
+        'latency': {stage: summarize(samples) for stage, samples in timings.items()},
+        'throughput_qps': round(runs / elapsed_total, 2),
+        'top3_misses': misses,
+    }
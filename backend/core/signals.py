@@ -1,12 +1,18 @@
 
 
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import User, Doctor, Appointment 
+from .models import User, Doctor, Appointment, AppointmentArchive
 
 
 from .utils import send_infobip_sms
-from .pinecone_utils import upsert_doctor, delete_doctor
+from .vector_sync import vector_sync_queue, embedded_state, EMBEDDED_DOCTOR_FIELDS
+from .caching import DOCTOR_SET_TAG, appointment_tags, doctor_tag, invalidate_tags_on_commit, patient_tag
+from .availability import record_slot_change
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -26,6 +32,26 @@ def send_appointment_confirmation_sms(sender, instance: Appointment, created: bo
             send_infobip_sms(patient.phone_number, message)
 
 
+# Appointment fields making up the `_loaded_slot` snapshot.
+SLOT_FIELDS = frozenset({'doctor_id', 'date', 'time', 'status'})
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_status(sender, instance: Appointment, **kwargs):
+    """
+    Snapshots the loaded status and slot so saves can detect a change without
+    re-reading the row. Instances loaded with some of them deferred get no
+    snapshot (reading them would re-query the row and recurse through this
+    handler); their slot change is then recorded as a booking only, which
+    can leave a freed slot shown as booked but never the reverse.
+    """
+    if SLOT_FIELDS.isdisjoint(instance.get_deferred_fields()):
+        instance._loaded_status = instance.status
+        instance._loaded_slot = (instance.doctor_id, instance.date, instance.time, instance.status)
+    else:
+        instance._loaded_status = instance._loaded_slot = None
+
+
 @receiver(pre_save, sender=Appointment)
 def handle_cancellation_notification(sender, instance: Appointment, **kwargs):
     """
@@ -33,16 +59,33 @@ def handle_cancellation_notification(sender, instance: Appointment, **kwargs):
     and triggers a notification.
     """
     if instance.pk: 
-        try:
-            old_instance = Appointment.objects.get(pk=instance.pk)
+        if instance._loaded_status == 'scheduled' and instance.status == 'cancelled':
+            doctor_email = instance.doctor.user.email
+            patient_name = instance.patient.get_full_name()
             
-            if old_instance.status == 'scheduled' and instance.status == 'cancelled':
-                doctor_email = instance.doctor.user.email
-                patient_name = instance.patient.get_full_name()
-                
-                print(f"NOTIFICATION LOGIC: Sending email to {doctor_email} that {patient_name} has cancelled their appointment for {instance.date} at {instance.time}.")
-        except Appointment.DoesNotExist:
-            pass 
+            logger.info("NOTIFICATION LOGIC: Sending email to %s that %s has cancelled their appointment for %s at %s.", doctor_email, patient_name, instance.date, instance.time)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_caches(sender, instance: Appointment, created: bool = False, **kwargs):
+    """
+    Updates the booked slots of the appointment's day (and of the day it
+    moved away from, if rescheduled) and invalidates the doctor's and
+    patient's cached views of it.
+    """
+    old = None if created else instance._loaded_slot
+    new = None if kwargs['signal'] is post_delete else (
+        instance.doctor_id, instance.date, instance.time, instance.status
+    )
+    record_slot_change(old, new)
+
+    tags = appointment_tags(instance.doctor_id, instance.patient_id)
+    if old is not None and old[0] != instance.doctor_id:
+        tags.append(doctor_tag(old[0]))
+    invalidate_tags_on_commit(*tags)
+    instance._loaded_slot = new
 
 
 
@@ -57,28 +100,126 @@ def create_doctor_profile_on_user_creation(sender, instance: User, created: bool
     if created and instance.role == 'doctor':
         Doctor.objects.create(user=instance)
         
-        print(f"Doctor profile automatically created for user: {instance.email}")
+        logger.info("Doctor profile automatically created for user: %s", instance.email)
+
+
 
 
 
+@receiver(post_init, sender=Doctor)
+def remember_doctor_embedded_state(sender, instance: Doctor, **kwargs):
+    """
+    Snapshots the embedded fields so post_save can tell whether they changed.
+    Instances loaded with some of them deferred (`only()`, cascading deletes)
+    get no snapshot, which post_save treats as changed; reading the fields
+    here would re-query the row and recurse through this handler.
+    """
+    if EMBEDDED_DOCTOR_FIELDS.isdisjoint(instance.get_deferred_fields()):
+        instance._embedded_state = embedded_state(instance)
+    else:
+        instance._embedded_state = None
 
 
 @receiver(post_save, sender=Doctor)
-def doctor_post_save_handler(sender, instance: Doctor, **kwargs):
+def doctor_post_save_handler(sender, instance: Doctor, created: bool, update_fields=None, **kwargs):
     """
     This signal is triggered whenever a Doctor instance is created or updated.
-    It calls a utility function to add/update the doctor's data in Pinecone.
-    This also handles deactivation by deleting the vector if is_active=False.
+    If a field that feeds the Pinecone document changed, the doctor is queued
+    for a coalesced background sync (which also handles deactivation).
+    Saves that only touch other fields (image, rating, fees...) are skipped.
     """
-    print(f"Pinecone Sync: post_save signal triggered for Doctor ID: {instance.id}")
-    upsert_doctor(instance.id)
+    if update_fields is not None:
+        touches_index = bool(EMBEDDED_DOCTOR_FIELDS.intersection(update_fields))
+    else:
+        touches_index = created or instance._embedded_state != embedded_state(instance)
+    instance._embedded_state = embedded_state(instance)
+
+    if touches_index:
+        logger.debug("Pinecone Sync: queued Doctor ID: %s", instance.id)
+        transaction.on_commit(lambda: vector_sync_queue.mark_dirty(instance.id))
+    invalidate_tags_on_commit(DOCTOR_SET_TAG, doctor_tag(instance.id))
 
 
 @receiver(post_delete, sender=Doctor)
 def doctor_post_delete_handler(sender, instance: Doctor, **kwargs):
     """
     This signal is triggered whenever a Doctor instance is deleted from the database.
-    It calls a utility function to remove the doctor's data from Pinecone.
+    The doctor is queued so the background sync removes its vector from Pinecone.
+    """
+    logger.debug("Pinecone Sync: queued deleted Doctor ID: %s", instance.id)
+    doctor_id = instance.id
+    transaction.on_commit(lambda: vector_sync_queue.mark_dirty(doctor_id))
+    invalidate_tags_on_commit(DOCTOR_SET_TAG, doctor_tag(doctor_id))
+
+
+@receiver(post_save, sender=User)
+def doctor_user_post_save_handler(sender, instance: User, update_fields=None, **kwargs):
+    """
+    Doctor payloads embed the doctor's user (name, contact, image), so edits to
+    a doctor's user also invalidate cached recommendations. Logins only touch
+    last_login and are ignored.
+    """
+    if instance.role == 'doctor' and update_fields != frozenset({'last_login'}):
+        invalidate_tags_on_commit(DOCTOR_SET_TAG)
+
+        # The doctor's name is part of the indexed document; the sync's
+        # content hash check drops the update if it did not change.
+        doctor_id = Doctor.objects.filter(user=instance).values_list('id', flat=True).first()
+        if doctor_id is not None:
+            transaction.on_commit(lambda: vector_sync_queue.mark_dirty(doctor_id))
+            invalidate_tags_on_commit(doctor_tag(doctor_id))
+
+
+# User fields shown in doctors' appointment and patient lists (UserSerializer).
+PATIENT_DISPLAY_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'role', 'phone_number',
+    'temporary_address', 'permanent_address', 'gender', 'date_of_birth', 'image',
+)
+
+
+def patient_display_state(user):
+    return tuple(getattr(user, field) for field in PATIENT_DISPLAY_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_patient_display_state(sender, instance: User, **kwargs):
+    """
+    Snapshots the displayed fields so post_save can tell whether doctors'
+    views of the patient changed. Deferred instances get no snapshot, which
+    counts as changed (reading the fields would recurse through this handler).
+    """
+    if instance.get_deferred_fields().isdisjoint(PATIENT_DISPLAY_FIELDS):
+        instance._display_state = patient_display_state(instance)
+    else:
+        instance._display_state = None
+
+
+def patient_display_changed(instance: User, update_fields) -> bool:
+    if update_fields is not None:
+        return not update_fields.isdisjoint(PATIENT_DISPLAY_FIELDS)
+    return instance._display_state != patient_display_state(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender, instance: User, update_fields=None, **kwargs):
+    """
+    Invalidates cached data showing the user: their own history under
+    `patient:{id}`, and, when a displayed field of a patient changed, the
+    appointment and patient lists of every doctor they have seen, archived
+    appointments included.
     """
-    print(f"Pinecone Sync: post_delete signal triggered for Doctor ID: {instance.id}")
-    delete_doctor(instance.id)
\ No newline at end of file
+    if update_fields == frozenset({'last_login'}):
+        return
+    tags = [patient_tag(instance.id)]
+    if (
+        instance.role == 'patient'
+        and kwargs.get('created') is False
+        and patient_display_changed(instance, update_fields)
+    ):
+        doctor_ids = Appointment.objects.filter(patient=instance).values_list('doctor_id', flat=True).union(
+            AppointmentArchive.objects.filter(patient=instance).values_list('doctor_id', flat=True)
+        )
+        tags += [doctor_tag(doctor_id) for doctor_id in doctor_ids]
+    instance._display_state = patient_display_state(instance)
+    invalidate_tags_on_commit(*tags)
@@ -0,0 +1,94 @@
+"""
+Request coalescing: concurrent callers asking for the same key wait on one
+computation and share its result.
+
+Within a worker, followers block on the leader's thread. With
+SINGLE_FLIGHT_SHARED (a cache shared by all workers, i.e. CACHE_BACKEND
+'file' or 'redis'), leaders in different workers also coordinate through a
+lock in the `default` cache, and the winner publishes its result there for
+the others, so a cache invalidation costs one computation rather than one
+per worker.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import SINGLE_FLIGHT_SHARED_RESULTS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def single_flight(name: str, key: str, compute, shared: bool = None):
+    """
+    Returns `compute()`, running it once for all concurrent callers with the
+    same `name` and `key`. `key` must identify the result completely (include
+    cache versions, normalized parameters...). The leader's exception is
+    raised in every follower. Results shared across workers must pickle.
+    """
+    flight_key = f'{name}:{key}'
+    with _calls_lock:
+        call = _calls.get(flight_key)
+        leader = call is None
+        if leader:
+            call = _calls[flight_key] = _Call()
+
+    if not leader:
+        SINGLE_FLIGHT_SHARED_RESULTS.labels(name, 'worker').inc()
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if settings.SINGLE_FLIGHT_SHARED if shared is None else shared:
+            call.result = _shared_flight(name, flight_key, compute)
+        else:
+            call.result = compute()
+        return call.result
+    except BaseException as error:
+        call.error = error
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[flight_key]
+        call.done.set()
+
+
+def _shared_flight(name, flight_key, compute):
+    """Runs `compute` in one worker; the others poll the cache for its result until SINGLE_FLIGHT_TIMEOUT."""
+    store = caches['default']
+    timeout = settings.SINGLE_FLIGHT_TIMEOUT
+    lock_key = f'single-flight:{flight_key}:lock'
+    result_key = f'single-flight:{flight_key}:result'
+
+    if store.add(lock_key, 1, timeout=timeout):
+        try:
+            result = compute()
+            store.set(result_key, (result,), timeout=timeout)
+            return result
+        finally:
+            store.delete(lock_key)
+
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        found = store.get_many([result_key, lock_key])
+        if result_key in found:
+            SINGLE_FLIGHT_SHARED_RESULTS.labels(name, 'cache').inc()
+            return found[result_key][0]
+        if lock_key not in found:
+            break  # The leader failed; compute locally.
+        delay = min(delay * 2, 0.1)
+    return compute()
@@ -1,3 +1,1322 @@
-from django.test import TestCase
+import copy
+import io
+import json
+import logging.config
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from contextlib import ExitStack
+from unittest.mock import patch
 
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from langchain_core.embeddings import Embeddings
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
 
+from .apps import is_server_process
+from .archival import archive_appointments
+from .availability import _booked_slots_key
+from .caching import cache_response, entry_timeout
+from .db_router import REPLICA_ALIAS, ReplicaRouter
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .embedding_server import MicroBatcher, RemoteEmbeddings, build_embedding_server
+from .middleware import ReplicaRoutingMiddleware
+from .models import Appointment, AppointmentArchive, Doctor, DoctorIndexEntry, User
+from .onnx_embeddings import ONNX_MODEL_FILENAME
+from .pinecone_utils import get_doctor_recommendations_with_scores
+from .single_flight import single_flight
+from .specialization_data import SPECIALIZATION_DESCRIPTIONS
+from .throttling import RecommendationAnonThrottle, inference_slot
+from .vector_sync import VectorSyncQueue
+from .views import MAX_BATCH_ISSUES, DoctorViewSet, TopRatedDoctorsView
+
+
+def specialization_corpus():
+    """Query- and passage-style texts built from SPECIALIZATION_DESCRIPTIONS."""
+    texts = []
+    for data in SPECIALIZATION_DESCRIPTIONS.values():
+        texts.append(f"passage: {data.get('core_focus', '')}")
+        texts.extend(f"query: {symptom}" for symptom in data.get('symptoms_keywords', []))
+        texts.extend(f"query: {condition}" for condition in data.get('conditions_treated', []))
+    return texts
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'embeddings.sqlite3')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        embedding_cache = EmbeddingCache(max_size=2)
+        embedding_cache.set('chest pain', [1.0])
+        embedding_cache.set('Skin  Rash', [2.0])
+        self.assertEqual(embedding_cache.get('chest pain'), [1.0])
+        embedding_cache.set('headache', [3.0])
+
+        self.assertIsNone(embedding_cache.get('skin rash'))
+        self.assertEqual(embedding_cache.get('CHEST PAIN'), [1.0])
+        self.assertEqual(embedding_cache.stats()['size'], 2)
+
+    def test_vectors_persist_in_batches(self):
+        embedding_cache = EmbeddingCache(max_size=1, path=self.path, flush_every=2, flush_interval=60)
+        embedding_cache.set('chest pain', [1.0, 0.5])
+        self.assertEqual(EmbeddingCache(path=self.path).get('chest pain'), None)
+        embedding_cache.set('skin rash', [2.0, 0.5])
+
+        reopened = EmbeddingCache(path=self.path)
+        self.assertEqual(reopened.get('chest pain'), [1.0, 0.5])
+        self.assertEqual(reopened.get('skin rash'), [2.0, 0.5])
+        self.assertEqual(reopened.stats()['disk_hits'], 2)
+
+    def test_locked_database_degrades_instead_of_failing(self):
+        embedding_cache = EmbeddingCache(path=self.path, flush_every=1, busy_timeout=0.01)
+        other_worker = sqlite3.connect(self.path, isolation_level=None)
+        other_worker.execute('BEGIN IMMEDIATE')
+        try:
+            embedding_cache.set('chest pain', [1.0])
+            self.assertEqual(embedding_cache.stats()['disk_errors'], 1)
+            self.assertEqual(embedding_cache.get('chest pain'), [1.0])
+        finally:
+            other_worker.execute('ROLLBACK')
+            other_worker.close()
+
+        embedding_cache.flush()
+        self.assertEqual(EmbeddingCache(path=self.path).get('chest pain'), [1.0])
+
+
+@skipUnless(
+    os.path.exists(os.path.join(settings.ONNX_MODEL_DIR, ONNX_MODEL_FILENAME)),
+    "ONNX model not exported; run 'python manage.py export_onnx_model'."
+)
+class OnnxEmbeddingParityTests(SimpleTestCase):
+    """The quantized ONNX backend must agree with the PyTorch model it replaces."""
+
+    def test_cosine_agreement_on_specialization_corpus(self):
+        from .pinecone_utils import build_embedding_provider
+
+        texts = specialization_corpus()
+        reference = np.array(build_embedding_provider('huggingface').embed_documents(texts))
+        quantized = np.array(build_embedding_provider('onnx').embed_documents(texts))
+
+        cosines = (reference * quantized).sum(axis=1)
+        self.assertGreaterEqual(cosines.min(), 0.97)
+        self.assertGreaterEqual(cosines.mean(), 0.99)
+
+    def test_single_query_matches_batch(self):
+        from .pinecone_utils import build_embedding_provider
+
+        provider = build_embedding_provider('onnx')
+        texts = specialization_corpus()[:8]
+        batch = np.array(provider.embed_documents(texts))
+        single = np.array([provider.embed_query(text) for text in texts])
+        np.testing.assert_allclose(batch, single, atol=1e-4)
+
+
+def create_doctor(username: str, specialization: str, is_active: bool = True) -> Doctor:
+    user = User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pass12345',
+        first_name='Doc', last_name=username, role='doctor'
+    )
+    Doctor.objects.filter(user=user).update(specialization=specialization, is_active=is_active)
+    return Doctor.objects.get(user=user)
+
+
+@patch('core.pinecone_utils.pinecone_vectorstore', None)
+class BatchRecommendationTests(APITestCase):
+    url = '/api/recommend-doctor-ai/batch/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cardiologists = [create_doctor(f'cardio_{i}', 'Cardiology') for i in range(3)]
+        cls.dermatologists = [create_doctor(f'derm_{i}', 'Dermatology') for i in range(2)]
+        cls.general = create_doctor('general_0', 'General Physician')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_follow_the_order_of_the_issues(self):
+        issues = ['high blood pressure', '  itchy skin rash ', 'high blood pressure']
+        response = self.client.post(self.url, {'issues': issues}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            [result['query'] for result in results],
+            ['high blood pressure', 'itchy skin rash', 'high blood pressure']
+        )
+        self.assertEqual({doctor['specialization'] for doctor in results[0]['recommendations']}, {'Cardiology'})
+        self.assertEqual({doctor['specialization'] for doctor in results[1]['recommendations']}, {'Dermatology'})
+        self.assertEqual(results[0], results[2])
+
+    def test_matches_single_query_recommendations(self):
+        from .pinecone_utils import get_doctor_recommendations
+
+        issues = ['high blood pressure', 'itchy skin rash', 'knee pain', 'something nobody treats']
+        response = self.client.post(self.url, {'issues': issues}, format='json')
+
+        for issue, result in zip(issues, response.data['results']):
+            expected = get_doctor_recommendations(issue, top_k=3, score_threshold=0.7)
+            self.assertEqual([doctor['id'] for doctor in result['recommendations']], [doctor.id for doctor in expected])
+            self.assertEqual(result['total_found'], len(expected))
+
+    def test_issue_count_is_capped(self):
+        response = self.client.post(self.url, {'issues': ['chest pain'] * MAX_BATCH_ISSUES}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), MAX_BATCH_ISSUES)
+
+        response = self.client.post(self.url, {'issues': ['chest pain'] * (MAX_BATCH_ISSUES + 1)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_invalid_issues(self):
+        for issues in ([], 'chest pain', ['chest pain', '  '], ['chest pain', 3]):
+            response = self.client.post(self.url, {'issues': issues}, format='json')
+            self.assertEqual(response.status_code, 400, issues)
+
+
+class RecordingEmbeddings(Embeddings):
+    """Embeds a text as [its length] and records every batch it is asked for."""
+
+    def __init__(self, error: Exception = None):
+        self.batches = []
+        self.error = error
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingServerTests(SimpleTestCase):
+    def embed_concurrently(self, batcher, requests):
+        results = {}
+
+        def embed(texts):
+            try:
+                results[tuple(texts)] = batcher.embed(texts)
+            except Exception as e:
+                results[tuple(texts)] = e
+
+        threads = [threading.Thread(target=embed, args=(texts,)) for texts in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_requests_share_one_forward_pass(self):
+        provider = RecordingEmbeddings()
+        batcher = MicroBatcher(provider, max_batch_size=64, max_wait_ms=300)
+        requests = [['chest pain'], ['rash', 'itchy skin'], ['knee pain']]
+
+        results = self.embed_concurrently(batcher, requests)
+
+        self.assertEqual(len(provider.batches), 1)
+        for texts in requests:
+            self.assertEqual(results[tuple(texts)], [[float(len(text))] for text in texts])
+
+    def test_batches_are_capped(self):
+        provider = RecordingEmbeddings()
+        batcher = MicroBatcher(provider, max_batch_size=2, max_wait_ms=300)
+
+        self.embed_concurrently(batcher, [[f'issue {i}'] for i in range(5)])
+
+        self.assertEqual(sorted(len(batch) for batch in provider.batches), [1, 2, 2])
+
+    def test_model_error_reaches_every_caller_in_the_batch(self):
+        batcher = MicroBatcher(RecordingEmbeddings(error=RuntimeError('out of memory')), max_wait_ms=300)
+        results = self.embed_concurrently(batcher, [['chest pain'], ['knee pain']])
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results.values()))
+
+    def test_remote_client_falls_back_while_the_server_is_down(self):
+        server_model, local_model = RecordingEmbeddings(), RecordingEmbeddings()
+        server = build_embedding_server('127.0.0.1', 0, MicroBatcher(server_model, max_wait_ms=1))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = RemoteEmbeddings(
+            f'http://127.0.0.1:{server.server_address[1]}', lambda: local_model, timeout=1, retry_after=30
+        )
+
+        self.assertEqual(client.embed_query('chest pain'), [10.0])
+        self.assertEqual(server_model.batches, [['chest pain']])
+
+        server.shutdown()
+        server.server_close()
+        with patch.object(client._session, 'post', wraps=client._session.post) as post:
+            self.assertEqual(client.embed_documents(['rash', 'knee pain']), [[4.0], [9.0]])
+            self.assertEqual(client.embed_query('rash'), [4.0])
+            # The server is not retried within the 30 second window.
+            self.assertEqual(post.call_count, 1)
+        self.assertEqual(local_model.batches, [['rash', 'knee pain'], ['rash']])
+
+        with patch('core.embedding_server.time.monotonic', return_value=time.monotonic() + 31), \
+                patch.object(client._session, 'post', wraps=client._session.post) as post:
+            client.embed_query('rash')
+            self.assertEqual(post.call_count, 1)
+
+
+class RecommenderWarmUpTests(SimpleTestCase):
+    def test_phrases_are_embedded_in_batches_and_index_loaded(self):
+        from .pinecone_utils import get_warmup_phrases, warm_up_recommender
+
+        provider = RecordingEmbeddings()
+        embedding_cache = EmbeddingCache()
+        with patch('core.pinecone_utils.embedding_model', CachedEmbeddings(lambda: provider, embedding_cache)), \
+                patch('core.pinecone_utils.query_embedding_cache', embedding_cache), \
+                patch('core.pinecone_utils.load_local_vector_index', return_value=7) as load_index:
+            report = warm_up_recommender(combination_limit=1, batch_size=50)
+
+        queries = [f"query: {phrase}" for phrase in get_warmup_phrases(combination_limit=1)]
+        self.assertEqual(report['phrases_embedded'], len(queries))
+        self.assertTrue(all(len(batch) <= 50 for batch in provider.batches))
+        self.assertTrue(all(embedding_cache.get(query) is not None for query in queries))
+        self.assertLessEqual(sum(len(batch) for batch in provider.batches), len(queries))
+        load_index.assert_called_once_with()
+        self.assertEqual(report['index_documents'], 7)
+
+    def test_warm_up_runs_only_in_server_processes(self):
+        self.assertTrue(is_server_process(['/venv/bin/gunicorn', 'backend.wsgi'], {}))
+        self.assertTrue(is_server_process(['manage.py', 'runserver'], {'RUN_MAIN': 'true'}))
+        self.assertTrue(is_server_process(['manage.py', 'runserver', '--noreload'], {}))
+        # The autoreloader parent, migrations, cron commands and the test runner.
+        self.assertFalse(is_server_process(['manage.py', 'runserver'], {}))
+        self.assertFalse(is_server_process(['manage.py', 'migrate'], {}))
+        self.assertFalse(is_server_process(['/usr/lib/python3/site-packages/django/__main__.py', 'send_reminders'], {}))
+
+        with override_settings(RECOMMENDER_WARMUP_ON_STARTUP=True), patch('core.apps.threading.Thread') as thread:
+            with patch('sys.argv', ['manage.py', 'migrate']):
+                apps.get_app_config('core').ready()
+            thread.assert_not_called()
+            with patch('sys.argv', ['gunicorn', 'backend.wsgi']):
+                apps.get_app_config('core').ready()
+            thread.return_value.start.assert_called_once_with()
+
+
+@patch('core.pinecone_utils.reindex_doctors', return_value={'upserted': 0, 'deleted': 0, 'unchanged': 0})
+class VectorSyncQueueTests(SimpleTestCase):
+    def test_repeated_marks_are_synced_with_one_upsert(self, reindex):
+        sync_queue = VectorSyncQueue(debounce_seconds=0.2)
+        for doctor_id in (3, 1, 3, 2, 1):
+            sync_queue.mark_dirty(doctor_id)
+        self.assertEqual(sync_queue.pending(), {1, 2, 3})
+        reindex.assert_not_called()
+
+        deadline = time.monotonic() + 5
+        while not reindex.called and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        reindex.assert_called_once_with(workers=1, doctor_ids=[1, 2, 3])
+
+    def test_flush_syncs_pending_ids_and_cancels_the_timer(self, reindex):
+        sync_queue = VectorSyncQueue(debounce_seconds=60)
+        sync_queue.mark_dirty(5)
+        sync_queue.mark_dirty(5)
+        sync_queue.flush()
+        sync_queue.flush()
+
+        reindex.assert_called_once_with(workers=1, doctor_ids=[5])
+        self.assertIsNone(sync_queue._timer)
+
+    def test_without_debounce_each_mark_syncs_immediately(self, reindex):
+        sync_queue = VectorSyncQueue(debounce_seconds=0)
+        sync_queue.mark_dirty(7)
+        reindex.assert_called_once_with(workers=1, doctor_ids=[7])
+        self.assertEqual(sync_queue.pending(), set())
+
+
+class FakeVectorStore:
+    """Stands in for the Pinecone vector store; upserts of `failing_ids` raise."""
+
+    def __init__(self, vectors=None, failing_ids=()):
+        self.vectors = dict(vectors or {})
+        self.failing_ids = set(failing_ids)
+        self.upserted = []
+        self.index = self
+
+    def add_documents(self, documents, ids):
+        if self.failing_ids & set(ids):
+            raise RuntimeError('upsert failed')
+        self.upserted.extend(ids)
+        self.vectors.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for vector_id in ids:
+            self.vectors.pop(vector_id, None)
+
+    def list(self):
+        yield list(self.vectors)
+
+
+@patch('core.signals.vector_sync_queue')
+class ReindexDoctorsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [create_doctor(f'indexed_{i}', 'Cardiology') for i in range(3)]
+
+    def reindex(self, store, **options):
+        from .pinecone_utils import reindex_doctors
+
+        with patch('core.pinecone_utils.pinecone_vectorstore', store):
+            return reindex_doctors(workers=1, max_retries=0, **options)
+
+    def indexed_ids(self):
+        return set(DoctorIndexEntry.objects.values_list('doctor_id', flat=True))
+
+    def test_only_new_or_changed_doctors_are_upserted(self, _):
+        store = FakeVectorStore()
+        self.assertEqual(self.reindex(store)['upserted'], 3)
+        self.assertEqual(self.indexed_ids(), {doctor.id for doctor in self.doctors})
+
+        store.upserted.clear()
+        Doctor.objects.filter(pk=self.doctors[0].pk).update(specialization='Dermatology')
+        report = self.reindex(store)
+        self.assertEqual((report['upserted'], report['unchanged'], report['deleted']), (1, 2, 0))
+        self.assertEqual(store.upserted, [str(self.doctors[0].id)])
+
+    def test_failed_batch_is_not_recorded(self, _):
+        failing = self.doctors[1]
+        report = self.reindex(FakeVectorStore(failing_ids={str(failing.id)}), batch_size=1)
+        self.assertEqual(report['failed'], [failing.id])
+        self.assertEqual(self.indexed_ids(), {self.doctors[0].id, self.doctors[2].id})
+
+        store = FakeVectorStore()
+        self.assertEqual(self.reindex(store, batch_size=1)['upserted'], 1)
+        self.assertEqual(store.upserted, [str(failing.id)])
+
+    def test_dry_run_writes_nothing(self, _):
+        store = FakeVectorStore({'999999': None})
+        report = self.reindex(store, dry_run=True, full=True)
+        self.assertEqual((report['upserted'], report['deleted']), (3, 1))
+        self.assertEqual(store.vectors, {'999999': None})
+        self.assertEqual(self.indexed_ids(), set())
+
+    def test_deactivated_and_deleted_doctors_are_removed(self, _):
+        store = FakeVectorStore()
+        self.reindex(store)
+        Doctor.objects.filter(pk=self.doctors[0].pk).update(is_active=False)
+        self.doctors[1].user.delete()
+
+        report = self.reindex(store)
+        self.assertEqual(report['deleted'], 2)
+        self.assertEqual(set(store.vectors), {str(self.doctors[2].id)})
+        self.assertEqual(self.indexed_ids(), {self.doctors[2].id})
+
+    def test_full_run_removes_vectors_without_index_entries(self, _):
+        # Indexed before DoctorIndexEntry rows were kept: an inactive and a deleted doctor.
+        Doctor.objects.filter(pk=self.doctors[0].pk).update(is_active=False)
+        store = FakeVectorStore({str(self.doctors[0].id): None, '999999': None})
+        self.assertEqual(self.reindex(store)['deleted'], 0)
+
+        self.assertEqual(self.reindex(store, full=True)['deleted'], 2)
+        self.assertEqual(set(store.vectors), {str(doctor.id) for doctor in self.doctors[1:]})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@patch('core.signals.vector_sync_queue')
+class DeferredFieldSnapshotTests(TestCase):
+    """The post_init snapshots must not load deferred fields (each load re-enters post_init)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = create_doctor('deferred_doctor', 'Cardiology')
+
+    def test_deferred_doctor_is_synced_when_saved(self, sync_queue):
+        doctor = Doctor.objects.only('id').get(pk=self.doctor.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.save()
+        sync_queue.mark_dirty.assert_called_once_with(self.doctor.pk)
+
+    def test_deferred_appointment_can_be_loaded_and_saved(self, _):
+        patient = User.objects.create_user(
+            username='deferred_patient', email='deferred_patient@example.com', password='pass12345', role='patient'
+        )
+        appointment = Appointment.objects.create(
+            patient=patient, doctor=self.doctor, date=date.today() + timedelta(days=1), time=dt_time(10, 0)
+        )
+        deferred = Appointment.objects.only('id', 'status').get(pk=appointment.pk)
+        self.assertIsNone(deferred._loaded_slot)
+        deferred.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            deferred.save()
+        self.assertEqual(Appointment.objects.get(pk=appointment.pk).status, 'cancelled')
+
+
+def legacy_fetch_doctors_by_specialization(specializations, per_specialization=None):
+    """The grouping the window-function query replaced: every active doctor of each specialization, by id."""
+    doctors_by_spec = defaultdict(list)
+    for doctor in Doctor.objects.filter(specialization__in=specializations, is_active=True).order_by('id'):
+        doctors_by_spec[doctor.specialization].append(doctor)
+    return doctors_by_spec
+
+
+@patch('core.pinecone_utils.pinecone_vectorstore', None)
+class DoctorSelectionParityTests(TestCase):
+    """Limiting doctors per specialization in SQL must not change which doctors are recommended, or in what order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Interleaved ids and inactive doctors, so per-specialization ranking matters.
+        for i in range(4):
+            for specialization in ('Cardiology', 'Orthopedics', 'Physical Therapy'):
+                create_doctor(f'{specialization[:5].lower()}_{i}', specialization, is_active=i != 1)
+        create_doctor('derm_inactive', 'Dermatology', is_active=False)
+        create_doctor('general_1', 'General Physician')
+        create_doctor('general_0', 'General Physician')
+
+    def assertSameAsLegacy(self, recommend):
+        current = recommend()
+        with patch('core.pinecone_utils.fetch_doctors_by_specialization', legacy_fetch_doctors_by_specialization):
+            legacy = recommend()
+        self.assertEqual([doctor.id for doctor in current], [doctor.id for doctor in legacy])
+        return current
+
+    def test_ranked_recommendations(self):
+        from .pinecone_utils import get_doctor_recommendations
+
+        for query in ('high blood pressure', 'knee pain', 'chest pain, ECG', 'itchy skin rash', 'nothing matches'):
+            for top_k in (1, 3, 5):
+                with self.subTest(query=query, top_k=top_k):
+                    doctors = self.assertSameAsLegacy(lambda: get_doctor_recommendations(query, top_k=top_k))
+                    self.assertTrue(doctors)
+                    self.assertTrue(all(doctor.is_active for doctor in doctors))
+
+    def test_keyword_fallbacks(self):
+        from .pinecone_utils import apply_fallbacks
+
+        cases = {
+            'best keyword match': {'Orthopedics': 0.9, 'Cardiology': 0.4},
+            'best match has no active doctor': {'Dermatology': 0.9},
+            'no keyword match': {},
+        }
+        for name, keyword_matches in cases.items():
+            for top_k in (1, 3, 5):
+                with self.subTest(name, top_k=top_k):
+                    self.assertSameAsLegacy(lambda: apply_fallbacks(keyword_matches, [], top_k))
+
+        orthopedists = apply_fallbacks(cases['best keyword match'], [], 3)
+        self.assertEqual({doctor.specialization for doctor in orthopedists}, {'Orthopedics'})
+        self.assertEqual(
+            [doctor.user.username for doctor in apply_fallbacks({'Dermatology': 0.9}, [], 3)],
+            ['general_1', 'general_0']
+        )
+
+
+@patch('core.signals.vector_sync_queue')
+@patch('core.pinecone_utils.pinecone_vectorstore', None)
+class RecommendationCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cardiologists = [create_doctor(f'cardio_{i}', 'Cardiology') for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_doctor_save_invalidates_cached_recommendations_on_commit(self, _):
+        from .recommendation_cache import get_cached_recommendations
+
+        query = 'high blood pressure'
+        first = get_cached_recommendations(query, top_k=2)
+        self.assertEqual([doctor['id'] for doctor in first], [doctor.id for doctor in self.cardiologists[:2]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor = self.cardiologists[0]
+            doctor.is_active = False
+            doctor.save()
+            # Until the save commits, other requests still see the old doctor set.
+            with self.assertNumQueries(0):
+                self.assertEqual(get_cached_recommendations(query, top_k=2), first)
+
+        self.assertEqual(
+            [doctor['id'] for doctor in get_cached_recommendations(query, top_k=2)],
+            [doctor.id for doctor in self.cardiologists[1:]]
+        )
+
+    def test_per_process_entries_expire_after_local_cache_timeout(self, _):
+        from .recommendation_cache import get_cached_recommendations
+
+        query = 'high blood pressure'
+        first = get_cached_recommendations(query, top_k=2)
+        # Another process changes the doctors; its tag bump never reaches this locmem cache.
+        Doctor.objects.filter(pk=self.cardiologists[0].pk).update(is_active=False)
+        Doctor.objects.filter(pk=self.cardiologists[1].pk).update(appointment_fee=Decimal('999.00'))
+        self.assertEqual(get_cached_recommendations(query, top_k=2), first)
+
+        later = settings.LOCAL_CACHE_TIMEOUT + 1
+        with patch('time.time', return_value=time.time() + later), \
+                patch('time.monotonic', return_value=time.monotonic() + later):
+            refreshed = get_cached_recommendations(query, top_k=2)
+        self.assertEqual([doctor['id'] for doctor in refreshed], [doctor.id for doctor in self.cardiologists[1:]])
+        self.assertEqual(Decimal(refreshed[0]['appointment_fee']), Decimal('999.00'))
+
+
+@override_settings(INFOBIP_API_KEY=None, MEDIA_ROOT=tempfile.mkdtemp())
+@patch('core.signals.vector_sync_queue')
+@patch('core.pinecone_utils.pinecone_vectorstore', None)
+class AvailabilityRankingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date.today() + timedelta(days=1)
+        cls.morning, cls.single_slot, cls.afternoon = [
+            create_doctor(f'available_{i}', 'Cardiology') for i in range(3)
+        ]
+        # Slots at 09:00 and 09:30; at 09:00 only; at 14:00 and 14:30.
+        for doctor, available_from, available_to in (
+            (cls.morning, dt_time(9, 0), dt_time(10, 0)),
+            (cls.single_slot, dt_time(9, 0), dt_time(9, 30)),
+            (cls.afternoon, dt_time(14, 0), dt_time(15, 0)),
+        ):
+            Doctor.objects.filter(pk=doctor.pk).update(available_from=available_from, available_to=available_to)
+        cls.patients = [
+            User.objects.create_user(
+                username=f'availability_patient_{i}', email=f'availability_patient_{i}@example.com',
+                password='pass12345', role='patient'
+            ) for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, doctor, patient, hour, minute=0, status='scheduled'):
+        appointment = Appointment.objects.create(
+            patient=patient, doctor=Doctor.objects.get(pk=doctor.pk), date=self.day, time=dt_time(hour, minute)
+        )
+        if status != 'scheduled':
+            Appointment.objects.filter(pk=appointment.pk).update(status=status)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, dt_time(hour, minute)))
+
+    def test_past_slots_earlier_today_are_skipped(self, _):
+        from .availability import next_free_slots
+
+        next_slots = next_free_slots(Doctor.objects.filter(pk=self.morning.pk), days=2, now=self.at(9, 15))
+        self.assertEqual(next_slots[self.morning.id], datetime.combine(self.day, dt_time(9, 30)))
+        next_slots = next_free_slots(Doctor.objects.filter(pk=self.morning.pk), days=2, now=self.at(9, 45))
+        self.assertEqual(next_slots[self.morning.id], datetime.combine(self.day + timedelta(days=1), dt_time(9, 0)))
+
+    def test_booked_slots_are_skipped_and_cancelled_ones_freed(self, _):
+        from .availability import next_free_slots
+
+        self.book(self.morning, self.patients[0], 9, 0, status='cancelled')
+        self.book(self.morning, self.patients[1], 9, 30)
+        self.book(self.single_slot, self.patients[2], 9, 0, status='completed')
+        next_slots = next_free_slots(Doctor.objects.filter(pk__in=[self.morning.pk, self.single_slot.pk]), days=1,
+                                     now=self.at(8))
+        self.assertEqual(next_slots, {self.morning.id: datetime.combine(self.day, dt_time(9, 0)), self.single_slot.id: None})
+
+    def test_fully_booked_doctors_sort_last(self, _):
+        from .availability import annotate_next_free_slots, sort_by_availability
+
+        self.book(self.single_slot, self.patients[0], 9)
+        doctors = list(Doctor.objects.filter(pk__in=[self.single_slot.pk, self.afternoon.pk, self.morning.pk]).order_by('id'))
+        with patch('django.utils.timezone.localtime', return_value=self.at(8)):
+            ranked = sort_by_availability(annotate_next_free_slots(doctors, days=1))
+        self.assertEqual([doctor.id for doctor in ranked], [self.morning.id, self.afternoon.id, self.single_slot.id])
+
+    def test_response_includes_next_available_slot(self, _):
+        self.book(self.morning, self.patients[0], 9)
+        self.book(self.morning, self.patients[1], 9, 30)
+        request = {'issue': 'high blood pressure', 'rank_by_availability': True, 'availability_days': 1}
+        with patch('django.utils.timezone.localtime', return_value=self.at(8)):
+            response = self.client.post('/api/recommend-doctor-ai/', request, format='json')
+
+        # The fully booked doctor loses its place to the later ones.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(doctor['id'], doctor['next_available_slot']) for doctor in response.data['recommendations']],
+            [(self.single_slot.id, f'{self.day.isoformat()}T09:00'), (self.afternoon.id, f'{self.day.isoformat()}T14:00')]
+        )
+
+
+class LoggingConfigTests(SimpleTestCase):
+    def tearDown(self):
+        logging.config.dictConfig(settings.LOGGING)
+
+    def configure(self, log_format):
+        stream = io.StringIO()
+        config = copy.deepcopy(settings.LOGGING)
+        config['handlers']['queue'].update(formatter=log_format, stream=stream)
+        logging.config.dictConfig(config)
+        return stream
+
+    def written(self, stream):
+        deadline = time.monotonic() + 5
+        while not stream.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return stream.getvalue()
+
+    def test_records_are_written_by_the_listener(self):
+        stream = self.configure('text')
+        logging.getLogger('core.tests').warning('Booking %s failed', 42)
+        self.assertRegex(self.written(stream), r'WARNING core\.tests Booking 42 failed\n$')
+
+    def test_json_format(self):
+        stream = self.configure('json')
+        logging.getLogger('core.tests').error('Booking %s failed', 42)
+        record = json.loads(self.written(stream))
+        self.assertEqual((record['level'], record['logger'], record['message']), ('ERROR', 'core.tests', 'Booking 42 failed'))
+
+
+def seed_query_budget_data(doctors: int, patients: int, appointments_per_patient: int):
+    """
+    Creates doctors across the known specializations, patients, and a mix of
+    past and upcoming appointments with bulk_create (no QR codes or SMS).
+    Returns (doctor_users, patient_users).
+    """
+    specializations = list(SPECIALIZATION_DESCRIPTIONS)
+    offset = User.objects.count()
+
+    doctor_users = []
+    for i in range(doctors):
+        user = User.objects.create_user(
+            username=f'budget_doctor_{offset + i}', email=f'budget_doctor_{offset + i}@example.com',
+            password='pass12345', first_name='Doc', last_name=str(i), role='doctor'
+        )
+        Doctor.objects.filter(user=user).update(
+            specialization=specializations[i % len(specializations)],
+            experience_years=i, rating=Decimal('4.50'),
+            available_from=dt_time(6, 0), available_to=dt_time(22, 0)
+        )
+        doctor_users.append(user)
+
+    patient_users = [
+        User.objects.create_user(
+            username=f'budget_patient_{offset + i}', email=f'budget_patient_{offset + i}@example.com',
+            password='pass12345', first_name='Pat', last_name=str(i), role='patient'
+        )
+        for i in range(patients)
+    ]
+
+    doctor_profiles = list(Doctor.objects.filter(user__in=doctor_users).order_by('id'))
+    today = date.today()
+    appointments = []
+    for p, patient in enumerate(patient_users):
+        for a in range(appointments_per_patient):
+            day_offset = a - appointments_per_patient // 2
+            appointments.append(Appointment(
+                patient=patient,
+                doctor=doctor_profiles[(p + a) % len(doctor_profiles)],
+                date=today + timedelta(days=day_offset),
+                time=dt_time(9 + a % 8, 0),
+                status='scheduled' if day_offset >= 0 else ('completed', 'no_show', 'cancelled')[a % 3],
+            ))
+    Appointment.objects.bulk_create(appointments)
+    return doctor_users, patient_users
+
+
+@override_settings(METRICS_TOKEN='scrape-secret', METRICS_ALLOWED_IPS=[])
+class MetricsEndpointTests(SimpleTestCase):
+    def test_requires_the_bearer_token_even_from_localhost(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'booking_conflicts_total', response.content)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_disabled_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips_restrict_token_holders(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer scrape-secret'}
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.6', **headers).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5', **headers).status_code, 200)
+
+
+@override_settings(
+    INFOBIP_API_KEY=None,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'api'},
+    },
+)
+@patch('core.pinecone_utils.pinecone_vectorstore', None)
+class QueryBudgetTests(APITestCase):
+    """
+    Maximum number of SQL queries per endpoint. The budgets are fixed and must
+    not depend on how many rows an endpoint returns; a per-row query (N+1)
+    shows up as the count growing when more data is seeded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users, cls.patient_users = seed_query_budget_data(
+            doctors=len(SPECIALIZATION_DESCRIPTIONS), patients=12, appointments_per_patient=6
+        )
+        cls.doctor_user = cls.doctor_users[0]
+        cls.patient_user = cls.patient_users[0]
+        cls.admin_user = User.objects.create_user(
+            username='budget_admin', email='budget_admin@example.com', password='pass12345',
+            role='admin', is_staff=True
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, user, method, url, data=None, status_code=None):
+        """Queries of one request, made on cold caches; it must succeed unless `status_code` is given."""
+        for store in caches.all():
+            store.clear()
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        if status_code is None:
+            self.assertLess(response.status_code, 400, response.content)
+        else:
+            self.assertEqual(response.status_code, status_code, response.content)
+        return len(queries)
+
+    def assertQueryBudget(self, budget, user, method, url, data=None, status_code=None):
+        count = self.count_queries(user, method, url, data, status_code)
+        self.assertLessEqual(count, budget, f"{method.upper()} {url} ran {count} queries (budget {budget})")
+
+    def assertQueryCountIndependentOfRows(self, user, method, url):
+        before = self.count_queries(user, method, url)
+        seed_query_budget_data(doctors=4, patients=4, appointments_per_patient=6)
+        after = self.count_queries(user, method, url)
+        self.assertEqual(before, after, f"{method.upper()} {url} went from {before} to {after} queries with more rows")
+
+    def scheduled_appointment(self, **filters):
+        return Appointment.objects.filter(status='scheduled', **filters).first()
+
+    def test_appointment_list(self):
+        self.assertQueryBudget(1, self.admin_user, 'get', '/api/appointments/')
+        self.assertQueryBudget(1, self.patient_user, 'get', '/api/appointments/')
+        self.assertQueryBudget(1, self.doctor_user, 'get', '/api/appointments/')
+        self.assertQueryCountIndependentOfRows(self.admin_user, 'get', '/api/appointments/')
+
+    def test_appointment_filter(self):
+        self.assertQueryBudget(1, self.admin_user, 'get', '/api/appointments/filter_appointments/?status=scheduled')
+
+    def test_appointment_detail(self):
+        appointment = Appointment.objects.filter(patient=self.patient_user).first()
+        self.assertQueryBudget(1, self.patient_user, 'get', f'/api/appointments/{appointment.id}/')
+
+    def test_doctor_list_and_detail(self):
+        self.assertQueryBudget(1, self.patient_user, 'get', '/api/doctors/')
+        self.assertQueryBudget(1, self.patient_user, 'get', f'/api/doctors/{self.doctor_user.doctor.id}/')
+        self.assertQueryCountIndependentOfRows(self.patient_user, 'get', '/api/doctors/')
+
+    def test_top_rated_doctors(self):
+        self.assertQueryBudget(1, None, 'get', '/api/doctors/top-rated/?limit=20')
+
+    def test_doctor_dashboard(self):
+        self.assertQueryBudget(4, self.doctor_user, 'get', '/api/doctor/dashboard-data/')
+
+    def test_doctor_patients(self):
+        self.assertQueryBudget(1, self.doctor_user, 'get', '/api/doctor/patients/')
+        self.assertQueryCountIndependentOfRows(self.doctor_user, 'get', '/api/doctor/patients/')
+
+    def test_booked_slots(self):
+        url = f'/api/booked-slots/?doctor_id={self.doctor_user.doctor.id}&date={date.today().isoformat()}'
+        self.assertQueryBudget(1, None, 'get', url)
+
+    def test_recommend(self):
+        self.assertQueryBudget(1, None, 'post', '/api/recommend-doctor-ai/', {'issue': 'chest pain and palpitations'})
+
+    def test_login(self):
+        self.client.force_authenticate(None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/auth/custom-login/', {'username': self.patient_user.username, 'password': 'pass12345'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 5)
+
+    def test_booking_create(self):
+        doctor = self.doctor_users[-1].doctor
+        booking = {'doctor_id': doctor.id, 'date': (date.today() + timedelta(days=30)).isoformat(), 'time': '10:00'}
+        self.assertQueryBudget(11, self.patient_users[-1], 'post', '/api/appointments/', booking)
+
+    def test_complete(self):
+        appointment = self.scheduled_appointment(doctor__user=self.doctor_user)
+        self.assertQueryBudget(2, self.doctor_user, 'post', f'/api/appointments/{appointment.id}/complete/')
+
+    def test_cancel(self):
+        # Patients may not cancel through the API (IsPatientOwnerOrDoctorOrAdmin), and the
+        # action refuses anyone but the patient, so only its rejections are reachable.
+        appointment = self.scheduled_appointment(patient=self.patient_user, date__gt=date.today())
+        url = f'/api/appointments/{appointment.id}/cancel/'
+        self.assertQueryBudget(1, self.patient_user, 'post', url, status_code=403)
+        self.assertQueryBudget(1, self.admin_user, 'post', url, status_code=403)
+
+    def test_no_show(self):
+        appointment = Appointment.objects.filter(doctor__user=self.doctor_user, date__lt=date.today()).first()
+        Appointment.objects.filter(pk=appointment.pk).update(status='scheduled')
+        self.assertQueryBudget(2, self.doctor_user, 'post', f'/api/appointments/{appointment.id}/no-show/')
+
+
+def explain_without_seq_scans(queryset):
+    """
+    EXPLAIN output for `queryset`. On PostgreSQL sequential scans are
+    disabled first, so that the tiny test tables are read through whichever
+    index the planner finds usable for the query.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            return queryset.explain()
+        finally:
+            cursor.execute('RESET enable_seqscan')
+
+
+class HotQueryIndexTests(TestCase):
+    """The hot Appointment and Doctor queries must be answered from the index added for them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users, cls.patient_users = seed_query_budget_data(
+            doctors=len(SPECIALIZATION_DESCRIPTIONS), patients=30, appointments_per_patient=8
+        )
+        cls.doctor = cls.doctor_users[0].doctor
+        cls.patient = cls.patient_users[0]
+
+    def assertUsesIndex(self, queryset, *index_names):
+        """The plan reads the table through one of `index_names`."""
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f"No plan check for {connection.vendor}.")
+        plan = explain_without_seq_scans(queryset)
+        used = [name for name in index_names if re.search(rf'\b{name}\b', plan)]
+        self.assertTrue(used, f"None of {index_names} in plan:\n{plan}")
+
+    def test_booked_slots_and_doctor_conflict(self):
+        today = date.today()
+        self.assertUsesIndex(Appointment.objects.filter(
+            doctor_id=self.doctor.id, date=today, status__in=['scheduled', 'completed']
+        ).values_list('time', flat=True), 'appt_doctor_date_status_idx')
+        self.assertUsesIndex(Appointment.objects.filter(
+            doctor=self.doctor, date=today, time=dt_time(10, 0), status__in=['scheduled', 'completed']
+        ), 'appt_doctor_date_status_idx')
+
+    def test_patient_conflicts(self):
+        today = date.today()
+        self.assertUsesIndex(Appointment.objects.filter(
+            patient=self.patient, date=today, time=dt_time(10, 0), status__in=['scheduled', 'completed']
+        ), 'appt_patient_date_time_idx')
+        self.assertUsesIndex(Appointment.objects.filter(
+            patient=self.patient, doctor=self.doctor, date=today, status__in=['scheduled', 'completed']
+        ), 'appt_patient_date_time_idx', 'appt_doctor_date_status_idx')
+
+    def test_availability_window(self):
+        today = date.today()
+        self.assertUsesIndex(Appointment.objects.filter(
+            doctor_id__in=[user.doctor.id for user in self.doctor_users[:5]],
+            date__gte=today, date__lt=today + timedelta(days=7),
+            status__in=['scheduled', 'completed']
+        ).values_list('doctor_id', 'date', 'time'), 'appt_doctor_date_status_idx')
+
+    def test_reminder_queries(self):
+        today = date.today()
+        self.assertUsesIndex(Appointment.objects.filter(
+            date=today, morning_reminder_sent=False, status='scheduled'
+        ), 'appt_morning_reminder_idx')
+        # Both partial indexes cover this query; which one wins is up to the planner.
+        self.assertUsesIndex(Appointment.objects.filter(
+            date=today, time__gte=dt_time(10, 0), time__lte=dt_time(10, 10),
+            thirty_min_reminder_sent=False, status='scheduled'
+        ), 'appt_thirty_min_reminder_idx', 'appt_scheduled_date_time_idx')
+
+    def test_no_show_sweep(self):
+        cutoff = datetime.now()
+        self.assertUsesIndex(Appointment.objects.filter(
+            Q(status='scheduled') & (Q(date__lt=cutoff.date()) | Q(date=cutoff.date(), time__lt=cutoff.time()))
+        ), 'appt_scheduled_date_time_idx')
+
+    def test_doctor_queries(self):
+        self.assertUsesIndex(
+            Doctor.objects.filter(is_active=True, specialization__in=['Cardiology', 'Neurology']),
+            'doctor_active_spec_idx'
+        )
+        self.assertUsesIndex(
+            Doctor.objects.filter(is_active=True).order_by('-experience_years', '-rating')[:5],
+            'doctor_active_top_idx'
+        )
+
+
+class AppointmentScopeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users, cls.patient_users = seed_query_budget_data(doctors=2, patients=3, appointments_per_patient=6)
+
+    def test_querysets_are_unordered_unless_asked(self):
+        self.assertFalse(Appointment.objects.filter(status='scheduled').ordered)
+        self.assertTrue(Appointment.objects.chronological().ordered)
+
+    def test_distinct_patient_count_ignores_dates(self):
+        doctor = self.doctor_users[0].doctor
+        expected = len({
+            patient_id for patient_id, status in
+            Appointment.objects.filter(doctor=doctor).values_list('patient_id', 'status') if status != 'cancelled'
+        })
+        counted = Appointment.objects.filter(doctor=doctor).exclude(status='cancelled').values('patient').distinct().count()
+        self.assertEqual(counted, expected)
+
+
+class AppointmentArchivalTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users, cls.patient_users = seed_query_budget_data(doctors=2, patients=3, appointments_per_patient=6)
+        Appointment.objects.filter(date__lt=date.today()).update(date=date.today() - timedelta(days=400))
+
+    def test_archives_only_old_finished_appointments(self):
+        old_finished = Appointment.objects.filter(
+            date__lt=date.today() - timedelta(days=365), status__in=AppointmentArchive.ARCHIVABLE_STATUSES
+        )
+        expected_ids = set(old_finished.values_list('id', flat=True))
+        remaining = Appointment.objects.count() - len(expected_ids)
+        self.assertTrue(expected_ids)
+
+        self.assertEqual(archive_appointments(older_than_days=365, batch_size=2, dry_run=True), len(expected_ids))
+        self.assertEqual(archive_appointments(older_than_days=365, batch_size=2), len(expected_ids))
+
+        self.assertEqual(set(AppointmentArchive.objects.values_list('id', flat=True)), expected_ids)
+        self.assertEqual(Appointment.objects.count(), remaining)
+        self.assertEqual(archive_appointments(older_than_days=365, batch_size=2), 0)
+
+    def test_history_includes_archived_only_when_asked(self):
+        patient = self.patient_users[0]
+        archive_appointments(older_than_days=365)
+        self.client.force_authenticate(patient)
+
+        live = self.client.get('/api/appointments/').json()
+        full = self.client.get('/api/appointments/?include_archived=true').json()
+
+        archived_ids = set(AppointmentArchive.objects.filter(patient=patient).values_list('id', flat=True))
+        self.assertTrue(archived_ids)
+        self.assertFalse(archived_ids & {row['id'] for row in live})
+        self.assertEqual({row['id'] for row in full}, {row['id'] for row in live} | archived_ids)
+        self.assertEqual([row['date'] for row in full], sorted((row['date'] for row in full), reverse=True))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp(),
+}})
+@patch('core.middleware.replica_configured', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only; no replica connection is opened."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def handle(self, request, view_func, write=False):
+        """Runs `request` through the middleware and returns where the view's reads were routed."""
+        routed = []
+
+        def get_response(request):
+            # Django calls process_view from inside the middleware chain.
+            middleware.process_view(request, view_func, (), {})
+            if write:
+                self.router.db_for_write(Appointment)
+            routed.append(self.router.db_for_read(Doctor))
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        return routed[0]
+
+    def test_only_marked_views_read_from_replica(self, _):
+        request = self.factory.get('/api/doctors/', HTTP_AUTHORIZATION='Token a')
+        self.assertEqual(self.handle(request, DoctorViewSet.as_view({'get': 'list'})), REPLICA_ALIAS)
+        self.assertEqual(self.handle(request, TopRatedDoctorsView.as_view()), REPLICA_ALIAS)
+        self.assertEqual(self.handle(request, lambda request: None), 'default')
+        self.assertEqual(self.router.db_for_read(Doctor), 'default')
+
+    def test_writes_pin_the_client_to_primary(self, _):
+        doctors = DoctorViewSet.as_view({'get': 'list'})
+        self.handle(self.factory.post('/api/appointments/', HTTP_AUTHORIZATION='Token a'), lambda request: None, write=True)
+
+        self.assertEqual(self.handle(self.factory.get('/api/doctors/', HTTP_AUTHORIZATION='Token a'), doctors), 'default')
+        self.assertEqual(self.handle(self.factory.get('/api/doctors/', HTTP_AUTHORIZATION='Token b'), doctors), REPLICA_ALIAS)
+
+    def test_requests_that_did_not_write_do_not_pin(self, _):
+        doctors = DoctorViewSet.as_view({'get': 'list'})
+        self.handle(self.factory.post('/api/recommend-doctor/', HTTP_AUTHORIZATION='Token a'), lambda request: None)
+        self.assertEqual(self.handle(self.factory.get('/api/doctors/', HTTP_AUTHORIZATION='Token a'), doctors), REPLICA_ALIAS)
+
+    def test_anonymous_clients_are_not_pinned(self, _):
+        # Behind nginx every anonymous request has the proxy's REMOTE_ADDR.
+        doctors = DoctorViewSet.as_view({'get': 'list'})
+        self.handle(self.factory.post('/api/recommend-doctor/', REMOTE_ADDR='127.0.0.1'), lambda request: None)
+        self.handle(self.factory.post('/api/users/', REMOTE_ADDR='127.0.0.1'), lambda request: None, write=True)
+        self.assertEqual(self.handle(self.factory.get('/api/doctors/', REMOTE_ADDR='127.0.0.1'), doctors), REPLICA_ALIAS)
+
+    def test_write_inside_read_request_switches_to_primary(self, _):
+        request = self.factory.get('/api/doctors/', HTTP_AUTHORIZATION='Token a')
+        self.assertEqual(self.handle(request, DoctorViewSet.as_view({'get': 'list'}), write=True), 'default')
+        self.assertEqual(self.router.db_for_write(Doctor), 'default')
+
+    def test_response_cache_is_filled_from_primary(self, _):
+        routed = []
+
+        class View:
+            @cache_response(tags=['doctor-set'], alias='default')
+            def get(view, request):
+                routed.append(self.router.db_for_read(Doctor))
+                return Response([])
+
+        def get_response(request):
+            middleware.process_view(request, DoctorViewSet.as_view({'get': 'list'}), (), {})
+            View().get(request)
+            routed.append(self.router.db_for_read(Doctor))
+
+        request = self.factory.get('/api/doctors/')
+        request.user = AnonymousUser()
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        self.assertEqual(routed, ['default', REPLICA_ALIAS])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_a_per_process_cache(self, _):
+        # A pin set by the worker handling the write would not reach the others.
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(lambda request: None)
+
+
+@override_settings(
+    INFOBIP_API_KEY=None,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'api'},
+    },
+)
+class CachedResponseTests(APITestCase):
+    """Cached API responses are served without queries and invalidated by the model signals on commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users, cls.patient_users = seed_query_budget_data(doctors=3, patients=2, appointments_per_patient=3)
+        cls.admin_user = User.objects.create_user(
+            username='cache_admin', email='cache_admin@example.com', password='pass12345',
+            role='admin', is_staff=True
+        )
+
+    def setUp(self):
+        for store in caches.all():
+            store.clear()
+
+    def test_doctor_list_is_cached_until_a_doctor_changes(self):
+        first = self.client.get('/api/doctors/').json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/doctors/').json(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor = self.doctor_users[0].doctor
+            doctor.appointment_fee = Decimal('999.00')
+            doctor.save()
+
+        fees = {row['id']: row['appointment_fee'] for row in self.client.get('/api/doctors/').json()}
+        self.assertEqual(Decimal(fees[doctor.id]), Decimal('999.00'))
+
+    def test_booking_invalidates_patient_history_and_doctor_dashboard(self):
+        patient, doctor_user = self.patient_users[0], self.doctor_users[0]
+        self.client.force_authenticate(doctor_user)
+        dashboard = self.client.get('/api/doctor/dashboard-data/').json()
+        self.client.force_authenticate(patient)
+        history = self.client.get('/api/appointments/').json()
+
+        booking = {'doctor_id': doctor_user.doctor.id, 'date': (date.today() + timedelta(days=1)).isoformat(), 'time': '21:30'}
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/appointments/', booking, format='json')
+        self.assertEqual(created.status_code, 201, created.content)
+
+        self.assertEqual(len(self.client.get('/api/appointments/').json()), len(history) + 1)
+        self.client.force_authenticate(doctor_user)
+        self.assertEqual(
+            self.client.get('/api/doctor/dashboard-data/').json()['stats']['appointments_this_week'],
+            dashboard['stats']['appointments_this_week'] + 1
+        )
+
+    def test_booked_slots_are_patched_by_booking_and_cancellation(self):
+        patient, doctor = self.patient_users[1], self.doctor_users[1].doctor
+        day = date.today() + timedelta(days=2)
+        url = f'/api/booked-slots/?doctor_id={doctor.id}&date={day.isoformat()}'
+        before = self.client.get(url).json()
+
+        self.client.force_authenticate(patient)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = {'doctor_id': doctor.id, 'date': day.isoformat(), 'time': '20:30'}
+            appointment_id = self.client.post('/api/appointments/', booking, format='json').json()['id']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), sorted(before + ['20:30']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.get(pk=appointment_id)
+            appointment.status = 'cancelled'
+            appointment.save(update_fields=['status'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), before)
+
+    def test_booked_slots_revalidate_with_etag(self):
+        url = f'/api/booked-slots/?doctor_id={self.doctor_users[0].doctor.id}&date={date.today().isoformat()}'
+        response = self.client.get(url)
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/booked-slots/?doctor_id=x&date=2026-01-01').status_code, 400)
+        self.assertEqual(self.client.get('/api/booked-slots/?doctor_id=1&date=tomorrow').status_code, 400)
+
+    def test_per_process_cache_entries_expire_quickly(self):
+        self.assertEqual(entry_timeout(600, 'api'), settings.LOCAL_CACHE_TIMEOUT)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()}
+        with override_settings(CACHES={'default': shared, 'api': shared}):
+            self.assertEqual(entry_timeout(600, 'api'), 600)
+
+    def test_booked_slots_etag_follows_the_slots(self):
+        # A worker whose per-process tag version missed a booking elsewhere
+        # reloads the slots once its entry expires; it must not answer 304.
+        doctor = self.doctor_users[2].doctor
+        day = date.today() + timedelta(days=3)
+        url = f'/api/booked-slots/?doctor_id={doctor.id}&date={day.isoformat()}'
+        etag = self.client.get(url)['ETag']
+
+        Appointment.objects.create(
+            patient=self.patient_users[0], doctor=Doctor.objects.get(pk=doctor.id), date=day, time=dt_time(21, 0)
+        )
+        caches['default'].delete(_booked_slots_key(doctor.id, day))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('21:00', response.json())
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_patient_edit_invalidates_doctors_seen_only_in_the_archive(self):
+        patient, past = self.patient_users[0], timezone.now() - timedelta(days=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor = create_doctor('archive_only_doctor', 'Cardiology')
+            AppointmentArchive.objects.create(
+                id=10 ** 9, patient=patient, doctor=doctor, date=past.date(), time=dt_time(10, 0),
+                status='completed', created_at=past, updated_at=past
+            )
+        self.client.force_authenticate(doctor.user)
+        url = '/api/doctor/patients/?include_archived=true'
+        self.assertEqual([row['first_name'] for row in self.client.get(url).json()], [patient.first_name])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            patient.first_name = 'Renamed'
+            patient.save()
+        self.assertEqual([row['first_name'] for row in self.client.get(url).json()], ['Renamed'])
+
+    def test_patient_save_without_displayed_changes_skips_the_doctor_lookup(self):
+        patient = User.objects.get(pk=self.patient_users[0].pk)
+        patient.set_password('another-pass-123')
+        with self.assertNumQueries(1):
+            patient.save()
+
+    def test_staff_appointment_list_is_not_cached(self):
+        self.client.force_authenticate(self.admin_user)
+        self.client.get('/api/appointments/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/appointments/')
+        self.assertGreater(len(queries), 0)
+
+
+@override_settings(SINGLE_FLIGHT_TIMEOUT=5)
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def run_concurrently(self, callers, target):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(target())
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return ['09:00']
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self.run_concurrently(8, lambda: single_flight('test', 'same-key', compute, shared=False))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['09:00']] * 8)
+        self.assertEqual(errors, [])
+
+    def test_leader_error_reaches_followers(self):
+        def compute():
+            time.sleep(0.2)
+            raise RuntimeError('database unavailable')
+
+        results, errors = self.run_concurrently(4, lambda: single_flight('test', 'failing', compute, shared=False))
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(error, RuntimeError) for error in errors))
+
+    def test_shared_flight_waits_for_another_workers_result(self):
+        # Another worker holds the lock and publishes its result shortly.
+        cache.add('single-flight:test:key:lock', 1)
+        threading.Timer(0.2, lambda: cache.set('single-flight:test:key:result', (['10:30'],))).start()
+
+        def compute():
+            raise AssertionError('computed despite a concurrent leader')
+
+        self.assertEqual(single_flight('test', 'key', compute, shared=True), ['10:30'])
+
+
+@override_settings(RECOMMENDER_ADMISSION_TIMEOUT=0)
+class RecommenderAdmissionTests(APITestCase):
+    """Over budget or at the inference limit, the recommender answers keyword-only instead of failing."""
+
+    def setUp(self):
+        cache.clear()
+
+    @patch.object(RecommendationAnonThrottle, 'THROTTLE_RATES', {'recommend_anon': '1/min'})
+    @patch('core.recommendation_cache.get_doctor_recommendations_with_scores', return_value=([], [], False))
+    def test_anonymous_client_over_budget_gets_keyword_only(self, recommend):
+        for issue in ('chest pain', 'knee pain'):
+            response = self.client.post('/api/recommend-doctor-ai/', {'issue': issue}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual([call.kwargs['keyword_only'] for call in recommend.call_args_list], [False, True])
+
+    @patch('core.pinecone_utils.embedding_model')
+    @patch('core.pinecone_utils.pinecone_vectorstore', object())
+    def test_busy_worker_skips_embedding(self, embedding_model):
+        with ExitStack() as held:
+            for _ in range(settings.RECOMMENDER_MAX_CONCURRENCY):
+                self.assertTrue(held.enter_context(inference_slot()))
+            _, _, vector_search_ok = get_doctor_recommendations_with_scores('my heart is racing', top_k=3)
+
+        embedding_model.embed_query.assert_not_called()
+        self.assertFalse(vector_search_ok)
@@ -0,0 +1,68 @@
+"""
+Admission control for the AI recommender.
+
+Requests over their rate budget, and requests arriving while the worker
+already runs RECOMMENDER_MAX_CONCURRENCY embeddings and vector searches, are
+not rejected: they are answered from the keyword-only path
+(`find_keyword_matches`), which needs no inference and keeps the workers
+free for booking traffic.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from .metrics import RECOMMENDATIONS_DEGRADED
+
+_inference_slots = threading.BoundedSemaphore(settings.RECOMMENDER_MAX_CONCURRENCY)
+
+
+class DegradingThrottleMixin:
+    """Never rejects a request; one over the rate is flagged with `request.recommendation_over_budget`."""
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            request.recommendation_over_budget = True
+        return True
+
+
+class RecommendationAnonThrottle(DegradingThrottleMixin, AnonRateThrottle):
+    scope = 'recommend_anon'
+
+
+class RecommendationUserThrottle(DegradingThrottleMixin, UserRateThrottle):
+    scope = 'recommend_user'
+
+    def get_cache_key(self, request, view):
+        # Anonymous clients are budgeted by RecommendationAnonThrottle only.
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+def over_recommendation_budget(request) -> bool:
+    over_budget = getattr(request, 'recommendation_over_budget', False)
+    if over_budget:
+        RECOMMENDATIONS_DEGRADED.labels('throttled').inc()
+    return over_budget
+
+
+@contextmanager
+def inference_slot(wanted: bool = True):
+    """
+    Yields True while holding one of the worker's inference slots, or False
+    (nothing held) if `wanted` is false or no slot frees up within
+    RECOMMENDER_ADMISSION_TIMEOUT seconds.
+    """
+    if not wanted:
+        yield False
+        return
+    if not _inference_slots.acquire(timeout=settings.RECOMMENDER_ADMISSION_TIMEOUT):
+        RECOMMENDATIONS_DEGRADED.labels('busy').inc()
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        _inference_slots.release()
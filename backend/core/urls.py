@@ -4,7 +4,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, DoctorViewSet, AppointmentViewSet,
-    get_current_user, recommend_doctor_ai, view_appointment_receipt, create_user_session, get_booked_slots, DoctorDashboardDataView, DoctorPatientsView, TopRatedDoctorsView
+    get_current_user, recommend_doctor_ai, recommend_doctor_ai_batch, view_appointment_receipt, create_user_session, get_booked_slots, DoctorDashboardDataView, DoctorPatientsView, TopRatedDoctorsView
 )
 
 router = DefaultRouter()
@@ -15,6 +15,7 @@ router.register(r'appointments', AppointmentViewSet, basename='appointment')
 urlpatterns = [
     path('users/me/', get_current_user, name='current-user'),
     path('recommend-doctor-ai/', recommend_doctor_ai, name='recommend-doctor-ai'),
+    path('recommend-doctor-ai/batch/', recommend_doctor_ai_batch, name='recommend-doctor-ai-batch'),
     path('receipt/<int:appointment_id>/', view_appointment_receipt, name='view_receipt'),
     path('auth/create-session/', create_user_session, name='create-session'),
     path('booked-slots/', get_booked_slots, name='get-booked-slots'),
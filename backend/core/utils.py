@@ -1,5 +1,10 @@
+import logging
 import requests
 from django.conf import settings
+from .instrumentation import timed
+from .metrics import SMS_MESSAGES
+
+logger = logging.getLogger(__name__)
 
 def send_infobip_sms(phone_number: str, message_text: str) -> bool:
     """
@@ -9,7 +14,8 @@ def send_infobip_sms(phone_number: str, message_text: str) -> bool:
 
     
     if not all([settings.INFOBIP_BASE_URL, settings.INFOBIP_API_KEY, settings.INFOBIP_SENDER_ID]):
-        print("ERROR: Infobip credentials are not fully configured in settings.py.")
+        logger.error("Infobip credentials are not fully configured in settings.py.")
+        SMS_MESSAGES.labels('failed').inc()
         return False
 
     
@@ -25,7 +31,7 @@ def send_infobip_sms(phone_number: str, message_text: str) -> bool:
         
         formatted_number = f"+977{phone_number}"
 
-    print(f"DEBUG: Original number: {phone_number}, Formatted: {formatted_number}")
+    logger.debug("Original number: %s, Formatted: %s", phone_number, formatted_number)
 
     
     api_url = f"https://{settings.INFOBIP_BASE_URL}/sms/2/text/advanced"
@@ -50,25 +56,26 @@ def send_infobip_sms(phone_number: str, message_text: str) -> bool:
 
     
     try:
-        response = requests.post(api_url, json=payload, headers=headers)
+        with timed('infobip'):
+            response = requests.post(api_url, json=payload, headers=headers)
         
         
         if response.status_code == 200:
-            response_data = response.json()
-            print(f"SUCCESS: SMS sent via Infobip API to {formatted_number}.")
-            print(f"Response: {response_data}")
+            logger.info("SMS sent via Infobip API to %s.", formatted_number)
+            logger.debug("Infobip response: %s", response.text)
+            SMS_MESSAGES.labels('sent').inc()
             return True
         else:
             
-            print(f"FAILED: Infobip API returned status code {response.status_code}.")
-            try:
-                error_response = response.json()
-                print(f"Response Body: {error_response}")
-            except:
-                print(f"Response Text: {response.text}")
+            logger.warning(
+                "Infobip API returned status code %s for %s: %s",
+                response.status_code, formatted_number, response.text[:500]
+            )
+            SMS_MESSAGES.labels('failed').inc()
             return False
 
     except requests.exceptions.RequestException as e:
         
-        print(f"FAILED: A network error occurred while contacting Infobip. Error: {e}")
+        logger.warning("A network error occurred while contacting Infobip: %s", e)
+        SMS_MESSAGES.labels('failed').inc()
         return False
\ No newline at end of file
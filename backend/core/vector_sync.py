@@ -0,0 +1,81 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Doctor fields that feed format_doctor_document(); saves touching none of
+# them cannot change the indexed document.
+EMBEDDED_DOCTOR_FIELDS = frozenset({'specialization', 'is_active', 'user', 'user_id'})
+
+
+def embedded_state(doctor):
+    return (doctor.specialization, doctor.is_active, doctor.user_id)
+
+
+class VectorSyncQueue:
+    """
+    Coalesces vector index updates for doctors.
+
+    Signal handlers only record dirty doctor ids. The first id marked starts a
+    window of `debounce_seconds`; when it ends, a background thread syncs every
+    id collected in the meantime with one incremental reindex. With a window
+    of 0, ids are synced immediately in the calling thread.
+    """
+
+    def __init__(self, debounce_seconds: float):
+        self.debounce_seconds = debounce_seconds
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def mark_dirty(self, doctor_id: int):
+        if self.debounce_seconds <= 0:
+            self._sync({doctor_id})
+            return
+
+        with self._lock:
+            self._dirty.add(doctor_id)
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce_seconds, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self):
+        with self._lock:
+            return set(self._dirty)
+
+    def flush(self):
+        """Syncs all pending doctor ids now."""
+        with self._lock:
+            doctor_ids, self._dirty = self._dirty, set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if doctor_ids:
+            self._sync(doctor_ids)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def _sync(self, doctor_ids):
+        from .pinecone_utils import reindex_doctors
+
+        try:
+            report = reindex_doctors(workers=1, doctor_ids=sorted(doctor_ids))
+            logger.info(
+                "Pinecone Sync: %s upserted, %s deleted, %s unchanged for Doctor IDs %s",
+                report['upserted'], report['deleted'], report['unchanged'], sorted(doctor_ids)
+            )
+        except Exception as e:
+            logger.exception("Pinecone Sync: error syncing Doctor IDs %s", sorted(doctor_ids))
+
+
+vector_sync_queue = VectorSyncQueue(settings.VECTOR_SYNC_DEBOUNCE_SECONDS)
+atexit.register(vector_sync_queue.flush)
@@ -1,29 +1,62 @@
 
 from django.contrib.auth import authenticate
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from .models import User, Doctor, Appointment
+from .models import User, Doctor, Appointment, AppointmentArchive
 from .serializers import UserSerializer, DoctorSerializer, AppointmentSerializer, AppointmentListSerializer, AdminUserSerializer 
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, BasePermission
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth import login 
 from django.views.decorators.csrf import csrf_exempt 
 from django.conf import settings
 from rest_framework.views import APIView
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from .pinecone_utils import get_doctor_recommendations
+from .pinecone_utils import get_doctor_recommendations, get_batch_doctor_recommendations
+from .recommendation_cache import get_cached_recommendations
+from .availability import cached_booked_slots, format_slot
+from .caching import DOCTOR_SET_TAG, cache_response, doctor_day_tag, doctor_tag, patient_tag
+from .instrumentation import timed
+from .metrics import collect_latest
+from .throttling import RecommendationAnonThrottle, RecommendationUserThrottle, over_recommendation_budget
 from .models import Doctor 
 from django.utils import timezone 
-from datetime import timedelta 
+from datetime import date, timedelta 
 from django.db.models import Count, Q 
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from django.core.exceptions import ValidationError
+import hashlib
+import hmac
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def own_doctor_tags(view, request, *args, **kwargs):
+    """Cache tags of a view showing a doctor their own data; other roles are not cached."""
+    if request.user.role != 'doctor':
+        return None
+    return [doctor_tag(request.user.doctor.id)]
+
+
+def own_appointments_tags(view, request, *args, **kwargs):
+    """Cache tags of a patient's or doctor's appointment list; staff lists span everyone and are not cached."""
+    if request.user.role == 'patient':
+        return [patient_tag(request.user.id), DOCTOR_SET_TAG]
+    return own_doctor_tags(view, request)
+
+
+def doctor_dashboard_tags(view, request, *args, **kwargs):
+    """The dashboard also lists today's appointments, so it is tagged with today as well."""
+    tags = own_doctor_tags(view, request)
+    if tags is not None:
+        tags.append(doctor_day_tag(request.user.doctor.id, timezone.now().date()))
+    return tags
+
 
 class TopRatedDoctorsView(APIView):
     """
@@ -32,7 +65,9 @@ class TopRatedDoctorsView(APIView):
     Accepts an optional 'limit' query parameter.
     """
     permission_classes = [AllowAny] 
+    use_read_replica = True
 
+    @cache_response(tags=[DOCTOR_SET_TAG])
     def get(self, request, *args, **kwargs):
         
         try:
@@ -43,7 +78,7 @@ class TopRatedDoctorsView(APIView):
         
         top_doctors = Doctor.objects.filter(
             is_active=True
-        ).order_by(
+        ).select_related('user').order_by(
             '-experience_years', 
             '-rating'            
         )[:limit] 
@@ -132,11 +167,12 @@ class UserViewSet(viewsets.ModelViewSet):
 class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DoctorSerializer
     permission_classes = [permissions.AllowAny]
+    use_read_replica = True
 
     def get_queryset(self):
        
         
-        queryset = Doctor.objects.filter(is_active=True)
+        queryset = Doctor.objects.filter(is_active=True).select_related('user')
 
         
         specialization = self.request.query_params.get('specialization', None)
@@ -158,7 +194,20 @@ class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
                 pass
         return queryset
 
+    @cache_response(tags=[DOCTOR_SET_TAG])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(tags=lambda view, request, pk=None, **kwargs: [doctor_tag(pk)])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+
 
+def wants_archived(request):
+    """True when the client asked for full history (?include_archived=true)."""
+    return str(request.query_params.get('include_archived', '')).lower() in ('1', 'true')
 
 
 class AppointmentViewSet(viewsets.ModelViewSet):
@@ -167,11 +216,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     
     serializer_class = AppointmentSerializer
 
-    def get_queryset(self):
-        
+    def scope_to_user(self, queryset):
+        """Restricts live or archived appointments to what the requesting user may see."""
         user = self.request.user
-    
-        queryset = Appointment.objects.all()
 
         if user.role == 'doctor':
             queryset = queryset.filter(doctor__user=user)
@@ -180,13 +227,31 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(patient=user)
 
         elif not user.is_staff:
-            return Appointment.objects.none()
+            return queryset.none()
 
         patient_id = self.request.query_params.get('patient_id', None)
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
 
-        return queryset.order_by('-date', '-time')
+        return queryset
+
+    def get_queryset(self):
+        queryset = Appointment.objects.select_related('patient__doctor', 'doctor__user')
+        return self.scope_to_user(queryset).order_by('-date', '-time')
+
+    @cache_response(tags=own_appointments_tags, per_user=True)
+    def list(self, request, *args, **kwargs):
+        """
+        Lists live appointments; with ?include_archived=true archived history
+        is merged in, newest first.
+        """
+        if not wants_archived(request):
+            return super().list(request, *args, **kwargs)
+
+        appointments = list(self.filter_queryset(self.get_queryset()))
+        appointments += self.scope_to_user(AppointmentArchive.objects.select_related('patient', 'doctor__user'))
+        appointments.sort(key=lambda appointment: (appointment.date, appointment.time), reverse=True)
+        return Response(AppointmentListSerializer(appointments, many=True).data)
         
     def get_serializer_class(self):
         """
@@ -335,6 +400,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, methods=['get'])
+    @cache_response(tags=own_appointments_tags, per_user=True)
     def filter_appointments(self, request):
         """
         Filter appointments by status and date.
@@ -371,7 +437,9 @@ class DoctorDashboardDataView(APIView):
     An endpoint that aggregates all necessary data for the doctor's dashboard.
     """
     permission_classes = [IsAuthenticated]
+    use_read_replica = True
 
+    @cache_response(tags=doctor_dashboard_tags, per_user=True)
     def get(self, request, *args, **kwargs):
         user = request.user
 
@@ -389,28 +457,34 @@ class DoctorDashboardDataView(APIView):
             todays_appointments = Appointment.objects.filter(
                 doctor__user=user,
                 date=today
-            ).order_by('time')
+            ).select_related('patient', 'doctor__user').chronological()
 
             
             
             
-            total_patients_count = Appointment.objects.filter(
-                doctor__user=user
-            ).exclude(status='cancelled').values('patient').distinct().count()
-
-            
-            today_appointments_count = todays_appointments.filter(status='scheduled').count()
+            # Patients and completion rate cover archived history too.
+            total_patients_count = User.objects.filter(
+                Q(id__in=Appointment.objects.filter(doctor__user=user).exclude(status='cancelled').values('patient_id')) |
+                Q(id__in=AppointmentArchive.objects.filter(doctor__user=user).exclude(status='cancelled').values('patient_id'))
+            ).count()
 
             
-            appointments_this_week_count = Appointment.objects.filter(
-                doctor__user=user,
-                date__range=[today, next_week],
-                status='scheduled'
-            ).count()
+            live_stats = Appointment.objects.filter(doctor__user=user).aggregate(
+                today_scheduled=Count('id', filter=Q(date=today, status='scheduled')),
+                week_scheduled=Count('id', filter=Q(date__range=[today, next_week], status='scheduled')),
+                completed=Count('id', filter=Q(status='completed')),
+                no_show=Count('id', filter=Q(status='no_show')),
+            )
+            archived_stats = AppointmentArchive.objects.filter(doctor__user=user).aggregate(
+                completed=Count('id', filter=Q(status='completed')),
+                no_show=Count('id', filter=Q(status='no_show')),
+            )
+            today_appointments_count = live_stats['today_scheduled']
+            appointments_this_week_count = live_stats['week_scheduled']
 
             
-            completed_count = Appointment.objects.filter(doctor__user=user, status='completed').count()
-            no_show_count = Appointment.objects.filter(doctor__user=user, status='no_show').count()
+            completed_count = live_stats['completed'] + archived_stats['completed']
+            no_show_count = live_stats['no_show'] + archived_stats['no_show']
             total_past_appointments = completed_count + no_show_count
             
             completion_rate = int((completed_count / total_past_appointments) * 100) if total_past_appointments > 0 else 100
@@ -433,7 +507,7 @@ class DoctorDashboardDataView(APIView):
             return Response(dashboard_data, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"Error in DoctorDashboardDataView: {e}")
+            logger.exception("Error in DoctorDashboardDataView")
             return Response(
                 {"error": "An error occurred while fetching dashboard data."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -441,7 +515,9 @@ class DoctorDashboardDataView(APIView):
 
 class DoctorPatientsView(APIView):
     permission_classes = [IsAuthenticated]
+    use_read_replica = True
 
+    @cache_response(tags=own_doctor_tags, per_user=True)
     def get(self, request, *args, **kwargs):
         if request.user.role != 'doctor':
             return Response({"error": "Permission denied."}, status=403)
@@ -450,8 +526,15 @@ class DoctorPatientsView(APIView):
             doctor__user=request.user,
             status__in=['completed', 'scheduled'] 
         ).values_list('patient_id', flat=True).distinct()
+        patients_filter = Q(id__in=patient_ids)
 
-        patients = User.objects.filter(id__in=patient_ids)
+        if wants_archived(request):
+            patients_filter |= Q(id__in=AppointmentArchive.objects.filter(
+                doctor__user=request.user,
+                status='completed'
+            ).values_list('patient_id', flat=True))
+
+        patients = User.objects.filter(patients_filter).select_related('doctor')
         serializer = UserSerializer(patients, many=True)
         return Response(serializer.data)
 
@@ -536,37 +619,18 @@ def create_user_session(request):
     return Response({'status': 'session created'}, status=status.HTTP_200_OK)
 
 
-pinecone_vectorstore = None
-try:
-    
-    if all([settings.PINECONE_API_KEY, settings.PINECONE_ENVIRONMENT]):
-        
-        embeddings = HuggingFaceEmbeddings(model_name="multi-qa-MiniLM-L6-cos-v1")
-        
-        
-        pinecone_vectorstore = PineconeVectorStore.from_existing_index(
-            index_name="health-doctors-hf",  
-            embedding=embeddings
-        )
-        print("Pinecone vector store (Hugging Face) connected successfully.")
-    else:
-        print("Pinecone credentials missing. AI Recommendation feature will be disabled.")
-except Exception as e:
-    print(f"Error connecting to Pinecone (Hugging Face): {e}. AI Recommendation feature will be disabled.")
-
-
-
-
-
-
-
+MAX_AVAILABILITY_DAYS = 30
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RecommendationAnonThrottle, RecommendationUserThrottle])
 def recommend_doctor_ai(request):
     """
-    Enhanced AI-powered doctor recommendation endpoint
+    Enhanced AI-powered doctor recommendation endpoint.
+    Pass "rank_by_availability": true (and optionally "availability_days", default 7)
+    to rank doctors by their earliest free slot and include it as "next_available_slot".
+    Clients over their rate budget get keyword-only recommendations.
     """
     try:
         user_query = request.data.get('issue', '').strip()
@@ -577,24 +641,45 @@ def recommend_doctor_ai(request):
             }, status=status.HTTP_400_BAD_REQUEST)
        
         
-        recommended_doctors = get_doctor_recommendations(
-            user_query, 
-            top_k=3, 
-            score_threshold=0.7  
-        )
-        
-        
-        serializer = DoctorSerializer(recommended_doctors, many=True)
+        keyword_only = over_recommendation_budget(request)
+        rank_by_availability = str(request.data.get('rank_by_availability', '')).lower() in ('1', 'true')
+        if rank_by_availability:
+            try:
+                availability_days = min(max(int(request.data.get('availability_days', 7)), 1), MAX_AVAILABILITY_DAYS)
+            except (ValueError, TypeError):
+                availability_days = 7
+            
+            
+            doctors = get_doctor_recommendations(
+                user_query,
+                top_k=3,
+                score_threshold=0.7,
+                availability_days=availability_days,
+                keyword_only=keyword_only
+            )
+            with timed('serialize'):
+                recommended_doctors = DoctorSerializer(doctors, many=True).data
+            for doctor, data in zip(doctors, recommended_doctors):
+                data['next_available_slot'] = (
+                    doctor.next_available_slot.strftime('%Y-%m-%dT%H:%M') if doctor.next_available_slot else None
+                )
+        else:
+            recommended_doctors = get_cached_recommendations(
+                user_query, 
+                top_k=3, 
+                score_threshold=0.7,
+                keyword_only=keyword_only
+            )
        
         return Response({
-            'recommendations': serializer.data,
+            'recommendations': recommended_doctors,
             'query': user_query,
             'total_found': len(recommended_doctors),
             'message': 'Recommendations generated successfully' if recommended_doctors else 'No specific matches found, showing general recommendations'
         })
        
     except Exception as e:
-        print(f"Error in recommend_doctor_ai view: {e}")
+        logger.exception("Error in recommend_doctor_ai view")
         
         
         try:
@@ -616,32 +701,127 @@ def recommend_doctor_ai(request):
 
 
 
+MAX_BATCH_ISSUES = 50
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([RecommendationAnonThrottle, RecommendationUserThrottle])
+def recommend_doctor_ai_batch(request):
+    """
+    Batched AI recommendations for triage/intake tooling.
+    Accepts {"issues": ["...", "..."]} and returns one result per issue, in order.
+    Clients over their rate budget get keyword-only recommendations.
+    """
+    issues = request.data.get('issues')
+
+    if not isinstance(issues, list) or not issues:
+        return Response({
+            'message': "A non-empty list of medical issues is required in 'issues'."
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(issues) > MAX_BATCH_ISSUES:
+        return Response({
+            'message': f"At most {MAX_BATCH_ISSUES} issues can be submitted per request."
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not all(isinstance(issue, str) and issue.strip() for issue in issues):
+        return Response({
+            'message': 'Every issue must be a non-empty string.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    user_queries = [issue.strip() for issue in issues]
+
+    try:
+        recommendations = get_batch_doctor_recommendations(
+            user_queries,
+            top_k=3,
+            score_threshold=0.7,
+            keyword_only=over_recommendation_budget(request)
+        )
+    except Exception as e:
+        logger.exception("Error in recommend_doctor_ai_batch view")
+        return Response({
+            'error': 'Recommendation system temporarily unavailable.',
+            'results': [],
+            'message': 'Please try again later'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    results = []
+    for user_query, recommended_doctors in zip(user_queries, recommendations):
+        with timed('serialize'):
+            serialized = DoctorSerializer(recommended_doctors, many=True).data
+        results.append({
+            'recommendations': serialized,
+            'query': user_query,
+            'total_found': len(recommended_doctors),
+            'message': 'Recommendations generated successfully' if recommended_doctors else 'No specific matches found, showing general recommendations'
+        })
+
+    return Response({
+        'results': results,
+        'total_queries': len(results)
+    })
+
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_booked_slots(request):
     """
     Retrieves a list of booked time slots for a specific doctor on a given date.
+    Served from the booked-slot cache with an ETag that changes whenever the
+    doctor-day changes, so browsers revalidate with a cheap 304. The ETag
+    covers the slots themselves: with a per-process cache another worker's
+    tag version can lag behind a booking.
     """
     doctor_id = request.query_params.get('doctor_id')
     date_str = request.query_params.get('date')
     
     if not doctor_id or not date_str:
         return Response({'error': "Both 'doctor_id' and 'date' parameters are required."}, status=400)
+
+    try:
+        doctor_id = int(doctor_id)
+        day = date.fromisoformat(date_str)
+    except ValueError:
+        return Response({'error': "'doctor_id' must be a number and 'date' a YYYY-MM-DD date."}, status=400)
     
     try:
-        unavailable_statuses = ['scheduled', 'completed']
-        appointments = Appointment.objects.filter(
-            doctor_id=doctor_id,
-            date=date_str, 
-            status__in=unavailable_statuses
-        ).values_list('time', flat=True)
+        slots, version = cached_booked_slots(doctor_id, day)
 
-        booked_times = [t.strftime('%H:%M') for t in appointments]
-        
-        print(f"DEBUG: Found booked times for doctor {doctor_id} on {date_str}: {booked_times}")
-        
-        return Response(booked_times)
+        digest = hashlib.sha1(','.join(map(str, slots)).encode('utf-8')).hexdigest()[:16]
+        etag = f'"{version}-{digest}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response([format_slot(minutes) for minutes in slots])
+
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.BOOKED_SLOTS_MAX_AGE)
+        return response
 
     except Exception as e:
-        print(f"Error in get_booked_slots: {e}")
-        return Response({'error': 'An internal server error occurred.'}, status=500)
\ No newline at end of file
+        logger.exception("Error in get_booked_slots")
+        return Response({'error': 'An internal server error occurred.'}, status=500)
+
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Answers only requests carrying
+    `Authorization: Bearer <METRICS_TOKEN>` (and, if METRICS_ALLOWED_IPS is
+    set, coming from one of those addresses); without a token it is disabled.
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponse("Forbidden.", status=403)
+    if settings.METRICS_ALLOWED_IPS and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponse("Forbidden.", status=403)
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+        response = HttpResponse("Unauthorized.", status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    
+    body, content_type = collect_latest()
+    return HttpResponse(body, content_type=content_type)